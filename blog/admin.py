@@ -1,9 +1,68 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib import admin
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
+
 from blog.models import Post, Tag, Comment
 
 
+class EstimatedCountPaginator(Paginator):
+    # an exact COUNT(*) of a big table is slower than the page itself,
+    # above ADMIN_EXACT_COUNT_LIMIT rows an estimate or a cached count is enough
+
+    @cached_property
+    def count(self):
+        estimate = self.get_estimate()
+        if estimate is not None and estimate > settings.ADMIN_EXACT_COUNT_LIMIT:
+            return estimate
+
+        query = self.object_list.query
+        cache_key = f'admin_count:{hashlib.md5(str(query).encode()).hexdigest()}'
+        count = cache.get(cache_key)
+        if count is None:
+            count = super().count
+            if count > settings.ADMIN_EXACT_COUNT_LIMIT:
+                cache.set(cache_key, count, timeout=settings.ADMIN_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def get_estimate(self):
+        queryset = self.object_list
+        if queryset.query.where or queryset.query.distinct:
+            return None
+
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+        elif connection.vendor == 'sqlite':
+            # filled by ANALYZE, the first number of every row is the table size
+            sql = "SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = %s LIMIT 1"
+        else:
+            return None
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [table])
+                row = cursor.fetchone()
+        except DatabaseError:
+            return None
+        if not row or row[0] is None or row[0] < 0:
+            return None
+        return row[0]
+
+
+class EstimatedCountAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(EstimatedCountAdmin):
     raw_id_fields = ['post', 'author']
     list_display = (
         'text',
@@ -22,12 +81,44 @@ class CommentAdmin(admin.ModelAdmin):
     post_title.short_description = 'Пост'
 
     list_select_related = ('author', 'post')
-    list_prefetch_related = ('post__author',)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match.url_name != 'blog_comment_changelist':
+            return queryset
+        return queryset.only('text', 'published_at', 'author__username', 'post__title')
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(EstimatedCountAdmin):
     raw_id_fields = ['author', 'likes', 'tags']
+    list_display = (
+        'title',
+        'author_username',
+        'published_at',
+        'likes_count',
+        'comments_count',
+        'tag_titles',
+    )
+    list_select_related = ('author',)
+
+    def author_username(self, obj):
+        return obj.author.username
+
+    def tag_titles(self, obj):
+        return ', '.join(tag.title for tag in obj.tags.all())
+
+    author_username.short_description = 'Автор'
+    tag_titles.short_description = 'Теги'
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match.url_name != 'blog_post_changelist':
+            return queryset
+        # the counters are kept on the post, only the tags need one more query per page
+        return queryset \
+            .only('title', 'published_at', 'likes_count', 'comments_count', 'author__username') \
+            .prefetch_related(Prefetch('tags', queryset=Tag.objects.only('title')))
 
 
 admin.site.register(Tag)
@@ -0,0 +1,172 @@
+import asyncio
+import functools
+from calendar import timegm
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from blog.pagination import encode_cursor
+from blog.sidebar import get_popular_posts, get_popular_tags
+from blog.timing import current_timings, measure_queries
+from blog.views import (
+    FEED_START,
+    fetch_feed_chunk,
+    fetch_fresh_posts,
+    fetch_post,
+    fetch_tag_posts,
+    get_feed_cursor,
+    get_feed_limit,
+    index_etag,
+    index_last_modified,
+    make_feed_limit_error,
+    post_etag,
+    post_last_modified,
+    serialize_feed_end,
+    serialize_feed_post,
+    tag_etag,
+    tag_last_modified,
+)
+
+
+def run_block(block, *args, thread_sensitive=False):
+    timings = current_timings.get()
+
+    def run():
+        with measure_queries(timings):
+            return block(*args)
+
+    def run_in_own_thread():
+        # no request starts or ends in the executor threads, so their
+        # connections are checked against CONN_MAX_AGE here, like a request does
+        close_old_connections()
+        try:
+            return run()
+        finally:
+            close_old_connections()
+
+    if thread_sensitive:
+        return sync_to_async(run, thread_sensitive=True)()
+    # thread_sensitive=False gives every block its own thread and database
+    # connection, so the blocks do not queue up behind each other
+    return sync_to_async(run_in_own_thread, thread_sensitive=False)()
+
+
+def async_condition(etag_func, last_modified_func):
+    def decorator(view):
+        @functools.wraps(view)
+        async def inner(request, *args, **kwargs):
+            def get_validators():
+                # one after the other, the second one reuses the timestamp of the first
+                return etag_func(request, *args, **kwargs), last_modified_func(request, *args, **kwargs)
+
+            etag, last_modified = await run_block(get_validators)
+            etag = quote_etag(etag) if etag else None
+            last_modified = timegm(last_modified.utctimetuple()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+
+def render_page(request, template_name, context):
+    return run_block(render, request, template_name, context, thread_sensitive=True)
+
+
+@async_condition(etag_func=index_etag, last_modified_func=index_last_modified)
+async def index(request, page=1):
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    # the number is only a label, the cursor picks the posts, and going back
+    # from the first page after new posts came out must not end on page 0
+    if page < 1 or page > 1 and not (after or before):
+        return redirect('index')
+
+    popular_posts, popular_tags, fresh_posts = await asyncio.gather(
+        run_block(get_popular_posts),
+        run_block(get_popular_tags),
+        run_block(fetch_fresh_posts, after, before),
+    )
+    context = {
+        'most_popular_posts': popular_posts,
+        'popular_tags': popular_tags,
+        'page': page,
+        'prev_page': max(page - 1, 1),
+        'next_page': page + 1,
+        **fresh_posts,
+    }
+    return await render_page(request, 'index.html', context)
+
+
+@async_condition(etag_func=post_etag, last_modified_func=post_last_modified)
+async def post_detail(request, slug):
+    post, popular_tags, popular_posts = await asyncio.gather(
+        run_block(fetch_post, slug, request.user),
+        run_block(get_popular_tags),
+        run_block(get_popular_posts),
+    )
+    context = {
+        **post,
+        'popular_tags': popular_tags,
+        'most_popular_posts': popular_posts,
+    }
+    return await render_page(request, 'post-details.html', context)
+
+
+@async_condition(etag_func=tag_etag, last_modified_func=tag_last_modified)
+async def tag_filter(request, tag_title):
+    tag_posts, popular_tags, popular_posts = await asyncio.gather(
+        run_block(fetch_tag_posts, tag_title),
+        run_block(get_popular_tags),
+        run_block(get_popular_posts),
+    )
+    context = {
+        **tag_posts,
+        'popular_tags': popular_tags,
+        'most_popular_posts': popular_posts,
+    }
+    return await render_page(request, 'posts-list.html', context)
+
+
+async def stream_posts(after, limit):
+    # Django reads a sync iterator to the end before sending it over ASGI,
+    # so here every chunk of posts is a keyset query of its own
+    yield FEED_START
+    number, next_cursor = 0, None
+    while number <= limit:
+        chunk_size = min(settings.POSTS_FEED_CHUNK_SIZE, limit + 1 - number)
+        posts = await run_block(fetch_feed_chunk, after, chunk_size)
+        for post in posts:
+            if number == limit:
+                next_cursor = after
+                break
+            yield serialize_feed_post(post, number)
+            after = encode_cursor(post)
+            number += 1
+        if next_cursor or len(posts) < chunk_size:
+            break
+    yield serialize_feed_end(next_cursor)
+
+
+async def posts_feed(request):
+    limit = get_feed_limit(request)
+    if limit is None:
+        return make_feed_limit_error()
+
+    return StreamingHttpResponse(
+        stream_posts(get_feed_cursor(request), limit),
+        content_type='application/json',
+    )
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from blog.models import Post
+from blog.serializers import serialize_post
+
+
+CARD_TEMPLATES = {
+    'wide': 'post-card.html',
+    'small': 'post-card-small.html',
+}
+# the fields the lists have to fetch to assemble a page of cached cards
+CARD_KEY_FIELDS = ['id', 'updated_at']
+
+
+def get_card_key(style, post_id, updated_at):
+    # updated_at changes on edits, new comments, likes and tag changes
+    return f'post_card:{style}:{post_id}:{int(updated_at.timestamp() * 1_000_000)}'
+
+
+def render_card(style, post, **extra_context):
+    return render_to_string(CARD_TEMPLATES[style], {'post': serialize_post(post), **extra_context})
+
+
+def get_cards(style, post_rows):
+    keys = {
+        post_row['id']: get_card_key(style, post_row['id'], post_row['updated_at'])
+        for post_row in post_rows
+    }
+    cached_cards = cache.get_many(keys.values())
+
+    missing_ids = [post_id for post_id, key in keys.items() if key not in cached_cards]
+    if missing_ids:
+        new_cards = {}
+        for post_id, post in Post.objects.for_cards().in_bulk(missing_ids).items():
+            # the card is stored under the version the list saw, a newer one gets its own key
+            new_cards[keys[post_id]] = render_card(style, post)
+        cache.set_many(new_cards, timeout=settings.POST_CARD_CACHE_TIMEOUT)
+        cached_cards.update(new_cards)
+
+    return [
+        mark_safe(cached_cards[key])
+        for key in keys.values()
+        if key in cached_cards
+    ]
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+
+from blog.models import Post, RelatedPost, Tag
+from blog.pagination import encode_cursor
+
+
+MANIFEST_NAME = 'export-manifest.json'
+PAGE_FILE_NAME = 'index.html'
+TAG_PAGE_SIZE = 20
+
+
+def make_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_page_file(url):
+    path = url.split('?')[0].strip('/')
+    return os.path.join(path, PAGE_FILE_NAME) if path else PAGE_FILE_NAME
+
+
+def hash_templates():
+    template_hash = hashlib.sha256()
+    for directory, __, file_names in sorted(os.walk(settings.TEMPLATE_DIR)):
+        for file_name in sorted(file_names):
+            with open(os.path.join(directory, file_name), 'rb') as file:
+                template_hash.update(file_name.encode())
+                template_hash.update(file.read())
+    return template_hash.hexdigest()
+
+
+def collect_site_inputs():
+    static_manifest = os.path.join(settings.STATIC_ROOT, 'staticfiles.json')
+    static_hash = None
+    if os.path.exists(static_manifest):
+        with open(static_manifest, 'rb') as file:
+            static_hash = hashlib.sha256(file.read()).hexdigest()
+    return {
+        'templates': hash_templates(),
+        'static': static_hash,
+        'posts_per_page': settings.POSTS_PER_PAGE,
+        'comments_per_page': settings.COMMENTS_PER_PAGE,
+    }
+
+
+def collect_sidebar_inputs():
+    return {
+        'posts': list(
+            Post.objects.trending(5).values_list('id', 'updated_at')
+            or Post.objects.popular().values_list('id', 'updated_at')[:5]
+        ),
+        'tags': list(Tag.objects.popular().values_list('title', 'posts_count')[:5]),
+    }
+
+
+def collect_pages():
+    # every page is described by what it is rendered from, so a page whose
+    # inputs hash did not change since the last export does not need rendering
+    posts = list(
+        Post.objects.order_by('-published_at', '-id')
+        .values('id', 'slug', 'published_at', 'updated_at')
+    )
+    tags = {tag['id']: tag for tag in Tag.objects.values('id', 'title', 'posts_count', 'updated_at')}
+
+    tag_ids_for_post = defaultdict(list)
+    for post_id, tag_id in Post.tags.through.objects.values_list('post_id', 'tag_id'):
+        tag_ids_for_post[post_id].append(tag_id)
+
+    updated_at_for_post = {post['id']: post['updated_at'] for post in posts}
+    related_for_post = defaultdict(list)
+    for post_id, related_id in RelatedPost.objects.order_by('post_id', '-score').values_list('post_id', 'related_id'):
+        related_for_post[post_id].append((related_id, updated_at_for_post.get(related_id)))
+
+    shared_inputs = {
+        'site': collect_site_inputs(),
+        'sidebar': collect_sidebar_inputs(),
+    }
+    pages = {}
+
+    per_page = settings.POSTS_PER_PAGE
+    page_chunks = [posts[start:start + per_page] for start in range(0, len(posts), per_page)] or [[]]
+    for number, chunk in enumerate(page_chunks, start=1):
+        if number == 1:
+            url = reverse('index')
+        else:
+            cursor = encode_cursor(page_chunks[number - 2][-1])
+            url = f'{reverse("index", kwargs={"page": number})}?after={cursor}'
+        pages[url] = make_hash({
+            **shared_inputs,
+            'page': number,
+            'is_last': number == len(page_chunks),
+            'posts': [(post['id'], post['updated_at']) for post in chunk],
+        })
+
+    posts_for_tag = defaultdict(list)
+    for post in posts:
+        # updated_at of a post moves with its comments, likes and tags
+        post_tags = sorted(
+            (tags[tag_id]['title'], tags[tag_id]['posts_count'])
+            for tag_id in tag_ids_for_post[post['id']]
+        )
+        pages[reverse('post_detail', kwargs={'slug': post['slug']})] = make_hash({
+            **shared_inputs,
+            'post': (post['id'], post['updated_at']),
+            'tags': post_tags,
+            'related': related_for_post[post['id']],
+        })
+        for tag_id in tag_ids_for_post[post['id']]:
+            posts_for_tag[tag_id].append((post['id'], post['updated_at']))
+
+    for tag_id, tag in tags.items():
+        pages[reverse('tag_filter', kwargs={'tag_title': tag['title']})] = make_hash({
+            **shared_inputs,
+            'tag': (tag['title'], tag['updated_at']),
+            'posts': posts_for_tag[tag_id][:TAG_PAGE_SIZE],
+        })
+    return pages
+
+
+def render_pages(output_dir, host, pages):
+    # runs in a worker process of export_site
+    client = Client(SERVER_NAME=host, REMOTE_ADDR='192.0.2.1')
+    rendered = []
+    for url, previous_content_hash in pages:
+        response = client.get(url)
+        if response.status_code != 200:
+            rendered.append((url, None, f'HTTP {response.status_code}'))
+            continue
+
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        page_path = os.path.join(output_dir, get_page_file(url))
+        # an unchanged page keeps its file, so rsync and CDNs see no change either
+        if content_hash != previous_content_hash or not os.path.exists(page_path):
+            os.makedirs(os.path.dirname(page_path), exist_ok=True)
+            with open(page_path, 'wb') as file:
+                file.write(response.content)
+        rendered.append((url, content_hash, None))
+    return rendered
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as file:
+            return json.load(file)['pages']
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(output_dir, pages):
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(f'{manifest_path}.tmp', 'w') as file:
+        json.dump({'pages': pages}, file, indent=2, sort_keys=True)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
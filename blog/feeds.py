@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.db.models import Prefetch
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+
+from blog.models import Post, Tag
+
+
+class LatestPostsFeed(Feed):
+    feed_type = Atom1Feed
+    title = 'Sensive Blog'
+    subtitle = 'Свежие посты блога'
+
+    def link(self):
+        return reverse('index')
+
+    def items(self):
+        return Post.objects.select_related('author') \
+            .only('title', 'teaser', 'slug', 'published_at', 'updated_at', 'author__username') \
+            .prefetch_related(Prefetch('tags', queryset=Tag.objects.only('title'))) \
+            .order_by('-published_at', '-id')[:settings.ATOM_FEED_POSTS]
+
+    def item_title(self, post):
+        return post.title
+
+    def item_description(self, post):
+        return post.teaser
+
+    def item_link(self, post):
+        return reverse('post_detail', kwargs={'slug': post.slug})
+
+    def item_pubdate(self, post):
+        return post.published_at
+
+    def item_updateddate(self, post):
+        return post.updated_at
+
+    def item_author_name(self, post):
+        return post.author.username
+
+    def item_categories(self, post):
+        return [tag.title for tag in post.tags.all()]
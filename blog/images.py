@@ -0,0 +1,133 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models.functions import Now
+from PIL import Image
+
+
+VARIANTS_DIR = 'variants'
+FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+executor = None
+
+logger = logging.getLogger('blog.images')
+
+
+def make_variants(source_path, target_dir, name_prefix, widths, quality):
+    # runs in a worker process, so it gets plain paths and settings, not models
+    with Image.open(source_path) as image:
+        image = image.convert('RGB')
+        original_width, original_height = image.size
+        variants = []
+        for width in sorted({min(width, original_width) for width in widths}):
+            height = round(original_height * width / original_width)
+            resized = image.resize((width, height), Image.LANCZOS)
+            for extension, image_format in FORMATS.items():
+                name = f'{name_prefix}-{width}w.{extension}'
+                resized.save(os.path.join(target_dir, os.path.basename(name)), image_format, quality=quality)
+                variants.append({
+                    'name': name,
+                    'format': extension,
+                    'width': width,
+                    'height': height,
+                })
+    return {
+        'width': original_width,
+        'height': original_height,
+        'variants': variants,
+    }
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return executor
+
+
+def submit_variants(pool, image_name):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    target_dir = default_storage.path(VARIANTS_DIR)
+    os.makedirs(target_dir, exist_ok=True)
+    return pool.submit(
+        make_variants,
+        default_storage.path(image_name),
+        target_dir,
+        f'{VARIANTS_DIR}/{stem}',
+        settings.IMAGE_VARIANT_WIDTHS,
+        settings.IMAGE_VARIANT_QUALITY,
+    )
+
+
+def save_variants(post_id, image_name, image_info):
+    from blog import sidebar
+    from blog.models import Post
+
+    image_info['source'] = image_name
+    # the image could be replaced while the variants were being made
+    updated = Post.objects.filter(pk=post_id, image=image_name).update(
+        image_variants=image_info,
+        updated_at=Now(),
+    )
+    if updated:
+        sidebar.bump_version()
+
+
+def schedule_variants(post):
+    post_id, image_name = post.pk, post.image.name
+
+    def on_done(future):
+        # runs in the thread of the executor, an error here would be lost silently
+        try:
+            save_variants(post_id, image_name, future.result())
+        except Exception:
+            logger.exception('Could not make the image variants of post %s from %s', post_id, image_name)
+        finally:
+            # connections are per thread, and no request ends in this one to close them
+            connections.close_all()
+
+    def submit():
+        future = submit_variants(get_executor(), image_name)
+        future.add_done_callback(on_done)
+
+    transaction.on_commit(submit)
+
+
+def needs_variants(post):
+    if not post.image:
+        return False
+    return post.image_variants.get('source') != post.image.name
+
+
+def serialize_image(post):
+    if not post.image:
+        return {'url': None}
+
+    serialized_image = {'url': post.image.url}
+    image_info = post.image_variants
+    if image_info.get('source') != post.image.name:
+        return serialized_image
+
+    srcsets = {}
+    for variant in image_info['variants']:
+        srcsets.setdefault(variant['format'], []).append(
+            f'{default_storage.url(variant["name"])} {variant["width"]}w'
+        )
+    serialized_image.update({
+        'width': image_info['width'],
+        'height': image_info['height'],
+        'webp_srcset': ', '.join(srcsets.get('webp', [])),
+        'jpeg_srcset': ', '.join(srcsets.get('jpeg', [])),
+    })
+    return serialized_image
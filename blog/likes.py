@@ -0,0 +1,116 @@
+import atexit
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+from django.db.models.functions import Now
+
+from blog import sidebar
+from blog.models import Post, count_related
+
+
+FLUSH_ATTEMPTS = 5
+
+lock = threading.Lock()
+flush_lock = threading.Lock()
+pending_likes = {}
+flush_timer = None
+
+
+def schedule_flush():
+    # called with the lock held
+    global flush_timer
+    if flush_timer is None:
+        flush_timer = threading.Timer(settings.LIKES_FLUSH_INTERVAL, flush_in_background)
+        flush_timer.daemon = True
+        flush_timer.start()
+
+
+def buffer_like(post_id, user_id, liked):
+    with lock:
+        # the last click of a user on a post wins, earlier ones never reach the db
+        pending_likes[(post_id, user_id)] = liked
+        buffer_is_full = len(pending_likes) >= settings.LIKES_FLUSH_SIZE
+        if not buffer_is_full:
+            schedule_flush()
+    if buffer_is_full:
+        flush_likes()
+
+
+def get_pending_like(post_id, user_id):
+    with lock:
+        return pending_likes.get((post_id, user_id))
+
+
+def flush_in_background():
+    try:
+        flush_likes()
+    finally:
+        connections.close_all()
+
+
+def flush_likes():
+    global flush_timer
+    # batches are written one at a time, so a later click never lands before an earlier one
+    with flush_lock:
+        with lock:
+            batch = dict(pending_likes)
+            pending_likes.clear()
+            if flush_timer is not None:
+                flush_timer.cancel()
+                flush_timer = None
+        if not batch:
+            return
+
+        for attempt in range(1, FLUSH_ATTEMPTS + 1):
+            try:
+                write_likes(batch)
+                return
+            except OperationalError:
+                # another worker holds the SQLite write lock, wait for it
+                if attempt == FLUSH_ATTEMPTS:
+                    # clicks made meanwhile are newer than the batch, and the
+                    # batch is tried again without waiting for the next click
+                    with lock:
+                        for key, liked in batch.items():
+                            pending_likes.setdefault(key, liked)
+                        schedule_flush()
+                    raise
+                time.sleep(0.05 * attempt)
+
+
+def write_likes(batch):
+    Like = Post.likes.through
+    liked_posts_for_user = defaultdict(list)
+    unliked_posts_for_user = defaultdict(list)
+    for (post_id, user_id), liked in batch.items():
+        if liked:
+            liked_posts_for_user[user_id].append(post_id)
+        else:
+            unliked_posts_for_user[user_id].append(post_id)
+
+    with transaction.atomic():
+        Like.objects.bulk_create(
+            [
+                Like(post_id=post_id, user_id=user_id)
+                for user_id, post_ids in liked_posts_for_user.items()
+                for post_id in post_ids
+            ],
+            ignore_conflicts=True,
+        )
+        for user_id, post_ids in unliked_posts_for_user.items():
+            Like.objects.filter(user_id=user_id, post_id__in=post_ids).delete()
+
+        # counting from the likes table instead of adding deltas keeps the
+        # counters right whatever other workers flushed meanwhile
+        affected_post_ids = {post_id for post_id, __ in batch}
+        Post.objects.filter(pk__in=affected_post_ids).update(
+            likes_count=count_related(Like, 'post'),
+            updated_at=Now(),
+        )
+        transaction.on_commit(sidebar.bump_version)
+
+
+atexit.register(flush_likes)
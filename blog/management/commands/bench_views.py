@@ -0,0 +1,149 @@
+import json
+import random
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from blog.models import Comment, Post, Tag
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for metric in header.split(','):
+        name, *params = metric.strip().split(';')
+        params = dict(param.split('=', 1) for param in params)
+        metrics[name] = params
+    return metrics
+
+
+def summarize(values, scale=1):
+    values = sorted(value * scale for value in values)
+    if len(values) > 1:
+        percentiles = statistics.quantiles(values, n=100, method='inclusive')
+    else:
+        percentiles = values * 99
+    return {
+        'mean': round(statistics.fmean(values), 3),
+        'max': round(values[-1], 3),
+        'p50': round(percentiles[49], 3),
+        'p95': round(percentiles[94], 3),
+        'p99': round(percentiles[98], 3),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Замеряет запросы к БД, время SQL, рендеринга и ответа для index, post_detail и tag_filter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--cold-cache',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--handler',
+            choices=['wsgi', 'asgi', 'both'],
+            default='wsgi',
+            help='Через какой обработчик гонять запросы: синхронные view или асинхронные через ASGI',
+        )
+        parser.add_argument('--output', help='Файл для JSON с результатами')
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        slugs = list(Post.objects.order_by('id').values_list('slug', flat=True))
+        tag_titles = list(Tag.objects.order_by('id').values_list('title', flat=True))
+        total = options['warmup'] + options['iterations']
+
+        urls_for_view = {
+            'index': [reverse('index')] * total,
+            'post_detail': [
+                reverse('post_detail', kwargs={'slug': slug})
+                for slug in rnd.choices(slugs, k=total)
+            ] if slugs else [],
+            'tag_filter': [
+                reverse('tag_filter', kwargs={'tag_title': title})
+                for title in rnd.choices(tag_titles, k=total)
+            ] if tag_titles else [],
+        }
+
+        results = {
+            'dataset': {
+                'posts': len(slugs),
+                'tags': len(tag_titles),
+                'comments': Comment.objects.count(),
+                'likes': Post.likes.through.objects.count(),
+            },
+            'iterations': options['iterations'],
+            'warmup': options['warmup'],
+            'seed': options['seed'],
+            'cold_cache': options['cold_cache'],
+            'handlers': {},
+        }
+
+        handlers = ['wsgi', 'asgi'] if options['handler'] == 'both' else [options['handler']]
+        for handler in handlers:
+            # REMOTE_ADDR outside of INTERNAL_IPS keeps debug_toolbar out of the numbers
+            if handler == 'asgi':
+                async_client = AsyncClient(client=['192.0.2.1', 0])
+
+                async def get_async(url, async_client=async_client):
+                    return await async_client.get(url)
+                get = async_to_sync(get_async)
+                urlconf = 'sensive_blog.urls_async'
+            else:
+                client = Client(REMOTE_ADDR='192.0.2.1')
+                get = client.get
+                urlconf = 'sensive_blog.urls'
+
+            # both test clients send Host: testserver
+            allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+            with override_settings(ROOT_URLCONF=urlconf, ALLOWED_HOSTS=allowed_hosts):
+                results['handlers'][handler] = {
+                    view_name: self.measure_view(get, urls, options)
+                    for view_name, urls in urls_for_view.items()
+                    if urls
+                }
+
+        report = json.dumps(results, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(report)
+        self.stdout.write(report)
+
+    def measure_view(self, get, urls, options):
+        queries, sql_times, render_times, latencies = [], [], [], []
+
+        for number, url in enumerate(urls):
+            if options['cold_cache']:
+                cache.clear()
+            started_at = time.perf_counter()
+            response = get(url)
+            latency = time.perf_counter() - started_at
+            if response.status_code != 200:
+                self.stderr.write(f'{url}: {response.status_code}')
+            if 'Server-Timing' not in response:
+                raise CommandError('Нет заголовка Server-Timing: подключите blog.middleware.ServerTimingMiddleware')
+            if number < options['warmup']:
+                continue
+            metrics = parse_server_timing(response['Server-Timing'])
+            queries.append(int(metrics['sql']['desc'].strip('"').split()[0]))
+            sql_times.append(float(metrics['sql']['dur']))
+            render_times.append(float(metrics['render']['dur']))
+            latencies.append(latency)
+
+        return {
+            'requests': len(latencies),
+            'queries': summarize(queries),
+            'sql_ms': summarize(sql_times),
+            'render_ms': summarize(render_times),
+            'latency_ms': summarize(latencies, 1000),
+        }
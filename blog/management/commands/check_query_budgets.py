@@ -0,0 +1,85 @@
+from urllib.parse import quote
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from blog.models import Post, Tag
+from blog.query_budget import QUERY_BUDGETS, QueryBudgetExceeded, enforce_query_budgets
+
+
+CHECK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'check_query_budgets',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = 'Проверяет, что страницы укладываются в заданное число SQL-запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='localhost')
+
+    def get_sample_urls(self):
+        post = Post.objects.order_by('-comments_count').first()
+        tag = Tag.objects.popular().first()
+        return {
+            'index': reverse('index'),
+            'post_detail': reverse('post_detail', kwargs={'slug': post.slug}) if post else None,
+            'post_comments': reverse('post_comments', kwargs={'slug': post.slug}) if post else None,
+            'tag_filter': reverse('tag_filter', kwargs={'tag_title': tag.title}) if tag else None,
+            'search': f'{reverse("search")}?q={quote(post.title.split()[0])}' if post else None,
+            'contacts': reverse('contacts'),
+            'blog_post_changelist': reverse('admin:blog_post_changelist'),
+            'blog_comment_changelist': reverse('admin:blog_comment_changelist'),
+        }
+
+    def handle(self, *args, **options):
+        # every page is requested with a cold cache, which must not be the cache
+        # the site shares with its workers
+        with override_settings(CACHES=CHECK_CACHES):
+            self.check_budgets(options)
+
+    def check_budgets(self, options):
+        client = Client(SERVER_NAME=options['host'], REMOTE_ADDR='192.0.2.1')
+        superuser = User.objects.filter(is_superuser=True, is_active=True).first()
+        if not superuser:
+            raise CommandError('Нет суперпользователя, чтобы проверить админку. Создайте его через createsuperuser')
+        admin_client = Client(SERVER_NAME=options['host'], REMOTE_ADDR='192.0.2.1')
+        admin_client.force_login(superuser)
+        sample_urls = self.get_sample_urls()
+        failures = []
+
+        for url_name, max_queries in QUERY_BUDGETS.items():
+            if url_name not in sample_urls:
+                # post_like changes the data, only pages that read it are requested
+                self.stdout.write(f'{url_name}: не проверяется командой')
+                continue
+            url = sample_urls[url_name]
+            url_client = client
+            if url_name.endswith('_changelist'):
+                url_client = admin_client
+            if not url:
+                # an unchecked page must not pass for one within its budget
+                failures.append(url_name)
+                self.stdout.write(self.style.ERROR(f'{url_name}: нет данных для проверки'))
+                continue
+
+            # the cold cache is the worst case the budget has to cover
+            cache.clear()
+            try:
+                with enforce_query_budgets():
+                    response = url_client.get(url)
+            except QueryBudgetExceeded as error:
+                failures.append(str(error))
+                self.stdout.write(self.style.ERROR(str(error)))
+                continue
+            self.stdout.write(f'{url_name}: {response["Server-Timing"]}, бюджет {max_queries}')
+
+        if failures:
+            raise CommandError(f'Не прошли проверку бюджета запросов: {len(failures)}')
+        self.stdout.write(self.style.SUCCESS('Все страницы укладываются в бюджет запросов'))
@@ -0,0 +1,95 @@
+import json
+import sys
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from blog.models import Comment, Post, Tag
+
+
+RECORD_TYPES = ['tag', 'post', 'comment', 'like']
+
+
+def export_tags(chunk_size):
+    for title in Tag.objects.order_by('id').values_list('title', flat=True).iterator(chunk_size=chunk_size):
+        yield {'type': 'tag', 'title': title}
+
+
+def export_posts(chunk_size):
+    posts = Post.objects.order_by('id') \
+        .select_related('author') \
+        .only('title', 'text', 'slug', 'image', 'published_at', 'author__username') \
+        .prefetch_related(Prefetch('tags', queryset=Tag.objects.only('title')))
+    for post in posts.iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'post',
+            'slug': post.slug,
+            'title': post.title,
+            'text': post.text,
+            'image': post.image.name,
+            'published_at': post.published_at,
+            'author': post.author.username,
+            'tags': [tag.title for tag in post.tags.all()],
+        }
+
+
+def export_comments(chunk_size):
+    comments = Comment.objects.order_by('id').values_list('post__slug', 'author__username', 'text', 'published_at')
+    for post_slug, author, text, published_at in comments.iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'comment',
+            'post': post_slug,
+            'author': author,
+            'text': text,
+            'published_at': published_at,
+        }
+
+
+def export_likes(chunk_size):
+    likes = Post.likes.through.objects.order_by('id').values_list('post__slug', 'user__username')
+    for post_slug, username in likes.iterator(chunk_size=chunk_size):
+        yield {'type': 'like', 'post': post_slug, 'user': username}
+
+
+EXPORTERS = {
+    'tag': export_tags,
+    'post': export_posts,
+    'comment': export_comments,
+    'like': export_likes,
+}
+
+
+class Command(BaseCommand):
+    help = 'Выгружает теги, посты, комментарии и лайки в JSONL, по записи на строку'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Файл для выгрузки или - для stdout')
+        parser.add_argument(
+            '--types',
+            nargs='+',
+            choices=RECORD_TYPES,
+            default=RECORD_TYPES,
+            help='Какие записи выгружать',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', encoding='utf-8')
+        counts = {}
+        try:
+            # posts go before their comments and likes, so the file can be imported in one pass
+            for record_type in RECORD_TYPES:
+                if record_type not in options['types']:
+                    continue
+                counts[record_type] = 0
+                for record in EXPORTERS[record_type](options['chunk_size']):
+                    output.write(json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False))
+                    output.write('\n')
+                    counts[record_type] += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        summary = ', '.join(f'{record_type}: {count}' for record_type, count in counts.items())
+        self.stderr.write(self.style.SUCCESS(f'Выгружено записей — {summary}'))
@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.export import collect_pages, get_page_file, load_manifest, render_pages, save_manifest
+
+
+class Command(BaseCommand):
+    help = 'Выгружает главную, посты и страницы тегов в статичные HTML-файлы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='Папка, куда выгрузить сайт')
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Перерисовать все страницы, даже если они не менялись',
+        )
+
+    def handle(self, *args, **options):
+        output_dir = os.path.abspath(options['output_dir'])
+        os.makedirs(output_dir, exist_ok=True)
+        manifest = {} if options['full'] else load_manifest(output_dir)
+
+        pages = {}
+        pages_to_render = []
+        for url, inputs_hash in collect_pages().items():
+            page_file = get_page_file(url)
+            pages[page_file] = {'url': url, 'inputs': inputs_hash}
+            previous_page = manifest.get(page_file)
+            if previous_page and previous_page['inputs'] == inputs_hash:
+                pages[page_file]['content'] = previous_page['content']
+            else:
+                previous_content_hash = previous_page['content'] if previous_page else None
+                pages_to_render.append((url, previous_content_hash))
+
+        batch_size = options['batch_size']
+        batches = [
+            pages_to_render[start:start + batch_size]
+            for start in range(0, len(pages_to_render), batch_size)
+        ]
+        failed = []
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        ) as pool:
+            futures = [pool.submit(render_pages, output_dir, options['host'], batch) for batch in batches]
+            for future in as_completed(futures):
+                for url, content_hash, error in future.result():
+                    page_file = get_page_file(url)
+                    if error:
+                        failed.append(f'{url}: {error}')
+                        # the old file stays, the page is rendered again on the next run
+                        if page_file in manifest:
+                            pages[page_file] = {**manifest[page_file], 'inputs': None}
+                        else:
+                            del pages[page_file]
+                        continue
+                    pages[page_file]['content'] = content_hash
+
+        removed = 0
+        for page_file in manifest.keys() - pages.keys():
+            page_path = os.path.join(output_dir, page_file)
+            if os.path.exists(page_path):
+                os.remove(page_path)
+                removed += 1
+        save_manifest(output_dir, pages)
+
+        for error in failed:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Страниц всего: {len(pages)}, перерисовано: {len(pages_to_render) - len(failed)}, '
+            f'удалено: {removed}, с ошибками: {len(failed)}'
+        ))
+        if failed:
+            raise CommandError('Не все страницы удалось выгрузить')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заполняет анонсы постов из начала их текста'
+
+    def handle(self, *args, **options):
+        updated = Post.objects.fill_teasers()
+        self.stdout.write(self.style.SUCCESS(f'Обновлено анонсов: {updated}'))
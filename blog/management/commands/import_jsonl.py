@@ -0,0 +1,225 @@
+import json
+import os
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from blog import sidebar
+from blog.models import Comment, Post, Tag
+
+
+REQUIRED_FIELDS = {
+    'tag': ['title'],
+    'post': ['slug', 'title', 'text', 'published_at', 'author', 'tags'],
+    'comment': ['post', 'author', 'text', 'published_at'],
+    'like': ['post', 'user'],
+}
+
+
+class Importer:
+    def __init__(self):
+        # natural keys of the file are mapped to ids once, not looked up row by row
+        self.user_ids = dict(User.objects.values_list('username', 'id'))
+        self.tag_ids = dict(Tag.objects.values_list('title', 'id'))
+        self.post_ids = dict(Post.objects.values_list('slug', 'id'))
+        self.counts = {'tag': 0, 'post': 0, 'comment': 0, 'like': 0}
+        self.clear()
+
+    def clear(self):
+        self.records = {'tag': [], 'post': [], 'comment': [], 'like': []}
+
+    def __len__(self):
+        return sum(len(records) for records in self.records.values())
+
+    def add(self, line_number, record):
+        record_type = record.get('type')
+        if record_type not in REQUIRED_FIELDS:
+            raise CommandError(f'Строка {line_number}: неизвестный тип записи {record_type!r}')
+        missing_fields = [field for field in REQUIRED_FIELDS[record_type] if field not in record]
+        if missing_fields:
+            raise CommandError(f'Строка {line_number}: нет полей {", ".join(missing_fields)}')
+        # cards of the index and the tag pages link to the first tag of a post
+        if record_type == 'post' and not record['tags']:
+            raise CommandError(f'Строка {line_number}: у поста нет тегов')
+        self.records[record_type].append((line_number, record))
+
+    def flush(self):
+        with transaction.atomic():
+            self.create_users()
+            self.create_tags()
+            self.create_posts()
+            self.create_comments()
+            self.create_likes()
+        self.clear()
+
+    def get_post_id(self, line_number, slug):
+        post_id = self.post_ids.get(slug)
+        if post_id is None:
+            raise CommandError(f'Строка {line_number}: нет поста {slug!r}')
+        return post_id
+
+    def create_users(self):
+        authors = {record['author'] for __, record in self.records['post']}
+        usernames = authors \
+            | {record['author'] for __, record in self.records['comment']} \
+            | {record['user'] for __, record in self.records['like']}
+        missing = usernames - self.user_ids.keys()
+        if not missing:
+            return
+        # imported users can not log in until somebody sets them a password
+        User.objects.bulk_create([
+            User(username=username, password=make_password(None), is_staff=username in authors)
+            for username in missing
+        ])
+        self.user_ids.update(User.objects.filter(username__in=missing).values_list('username', 'id'))
+
+    def create_tags(self):
+        titles = {record['title'] for __, record in self.records['tag']}
+        for __, record in self.records['post']:
+            titles.update(record['tags'])
+        missing = titles - self.tag_ids.keys()
+        if not missing:
+            return
+        Tag.objects.bulk_create([Tag(title=title) for title in missing], ignore_conflicts=True)
+        self.tag_ids.update(Tag.objects.filter(title__in=missing).values_list('title', 'id'))
+        self.counts['tag'] += len(missing)
+
+    def create_posts(self):
+        # posts that are already in the db are skipped, so a file can be imported again
+        new_records = {}
+        for __, record in self.records['post']:
+            if record['slug'] not in self.post_ids:
+                new_records[record['slug']] = record
+        if not new_records:
+            return
+
+        Post.objects.bulk_create([
+            Post(
+                title=record['title'],
+                text=record['text'],
+                slug=record['slug'],
+                image=record.get('image', ''),
+                published_at=parse_datetime(record['published_at']),
+                author_id=self.user_ids[record['author']],
+            )
+            for record in new_records.values()
+        ])
+        self.post_ids.update(Post.objects.filter(slug__in=new_records).values_list('slug', 'id'))
+        Post.tags.through.objects.bulk_create(
+            [
+                Post.tags.through(post_id=self.post_ids[slug], tag_id=self.tag_ids[title])
+                for slug, record in new_records.items()
+                for title in set(record['tags'])
+            ],
+            ignore_conflicts=True,
+        )
+        self.counts['post'] += len(new_records)
+
+    def create_comments(self):
+        if not self.records['comment']:
+            return
+        comments = [
+            Comment(
+                post_id=self.get_post_id(line_number, record['post']),
+                author_id=self.user_ids[record['author']],
+                text=record['text'],
+                published_at=parse_datetime(record['published_at']),
+            )
+            for line_number, record in self.records['comment']
+        ]
+        # comments have no natural key, one with the same post, author, time and
+        # text is taken for a copy, so a file can be imported again
+        seen_keys = set(
+            Comment.objects \
+                .filter(post_id__in={comment.post_id for comment in comments}) \
+                .values_list('post_id', 'author_id', 'published_at', 'text')
+        )
+        new_comments = []
+        for comment in comments:
+            key = (comment.post_id, comment.author_id, comment.published_at, comment.text)
+            if key not in seen_keys:
+                seen_keys.add(key)
+                new_comments.append(comment)
+        Comment.objects.bulk_create(new_comments)
+        self.counts['comment'] += len(new_comments)
+
+    def create_likes(self):
+        if not self.records['like']:
+            return
+        likes = {
+            (self.get_post_id(line_number, record['post']), self.user_ids[record['user']])
+            for line_number, record in self.records['like']
+        }
+        # bulk_create with ignore_conflicts does not tell which rows it skipped,
+        # so the likes already in the db are left out beforehand for the summary
+        likes -= set(
+            Post.likes.through.objects \
+                .filter(post_id__in={post_id for post_id, __ in likes}) \
+                .values_list('post_id', 'user_id')
+        )
+        Post.likes.through.objects.bulk_create(
+            [Post.likes.through(post_id=post_id, user_id=user_id) for post_id, user_id in likes],
+            ignore_conflicts=True,
+        )
+        self.counts['like'] += len(likes)
+
+
+class Command(BaseCommand):
+    help = 'Загружает теги, посты, комментарии и лайки из JSONL, который выгружает export_jsonl'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл JSONL')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать с начала файла, даже если прошлый запуск упал на середине',
+        )
+
+    def handle(self, *args, **options):
+        progress_path = f'{options["input"]}.progress'
+        done_lines = 0
+        if os.path.exists(progress_path) and not options['restart']:
+            with open(progress_path) as progress_file:
+                done_lines = int(progress_file.read() or 0)
+            self.stdout.write(f'Продолжаю после строки {done_lines}')
+
+        importer = Importer()
+        line_number = done_lines
+        with open(options['input'], encoding='utf-8') as input_file:
+            for line_number, line in enumerate(input_file, start=1):
+                if line_number <= done_lines or not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as error:
+                    raise CommandError(f'Строка {line_number}: {error}')
+                importer.add(line_number, record)
+
+                if len(importer) >= options['batch_size']:
+                    importer.flush()
+                    self.save_progress(progress_path, line_number)
+            importer.flush()
+
+        # bulk_create skips the signals, so the counters are rebuilt once at the end
+        call_command('recount_counters', stdout=self.stdout)
+        call_command('rebuild_related_posts', stdout=self.stdout)
+        call_command('refresh_trending', full=True, stdout=self.stdout)
+        sidebar.bump_version()
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+
+        summary = ', '.join(f'{record_type}: {count}' for record_type, count in importer.counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано строк: {line_number - done_lines}. Обработано записей — {summary}'
+        ))
+
+    def save_progress(self, progress_path, line_number):
+        # written only after the batch is committed, a rerun starts right after it
+        with open(f'{progress_path}.tmp', 'w') as progress_file:
+            progress_file.write(str(line_number))
+        os.replace(f'{progress_path}.tmp', progress_path)
@@ -0,0 +1,40 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from blog.images import needs_variants, save_variants, submit_variants
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать копии и для постов, у которых они уже есть',
+        )
+        parser.add_argument('--workers', type=int, default=None)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('image', 'image_variants')
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {}
+            for post in posts.iterator():
+                if options['all'] or needs_variants(post):
+                    futures[submit_variants(pool, post.image.name)] = post
+
+            done, failed = 0, 0
+            for future in as_completed(futures):
+                post = futures[future]
+                try:
+                    save_variants(post.pk, post.image.name, future.result())
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{post.image.name}: {error}')
+                else:
+                    done += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Готово: {done}, с ошибками: {failed}'))
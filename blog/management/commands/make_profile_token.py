@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog.profiling import make_profile_token
+
+
+class Command(BaseCommand):
+    help = 'Выдаёт значение заголовка X-Profile, чтобы снять профиль одного запроса'
+
+    def handle(self, *args, **options):
+        if not settings.PROFILE_DIR:
+            self.stderr.write('PROFILE_DIR не задан, профили сохраняться не будут')
+        self.stdout.write(make_profile_token())
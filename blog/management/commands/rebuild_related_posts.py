@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from blog import sidebar
+from blog.related import rebuild_related_posts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие посты по общим тегам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        links_count = rebuild_related_posts(batch_size=options['batch_size'])
+        sidebar.bump_version()
+        self.stdout.write(self.style.SUCCESS(f'Похожие посты пересчитаны, связей: {links_count}'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Q
+
+from blog.models import Post, Tag
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики лайков, комментариев и постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счётчики, ничего не исправляя',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            broken_posts = Post.objects.with_actual_counts().filter(
+                ~Q(likes_count=F('actual_likes_count')) | ~Q(comments_count=F('actual_comments_count'))
+            )
+            broken_tags = Tag.objects.with_actual_counts().exclude(posts_count=F('actual_posts_count'))
+
+            broken_posts = list(broken_posts.values('id', 'actual_likes_count', 'actual_comments_count'))
+            broken_tags = list(broken_tags.values('id', 'actual_posts_count'))
+
+            self.stdout.write(f'Постов с неверными счётчиками: {len(broken_posts)}')
+            self.stdout.write(f'Тегов с неверными счётчиками: {len(broken_tags)}')
+
+            if options['check']:
+                if broken_posts or broken_tags:
+                    raise CommandError('Счётчики расходятся с данными')
+                return
+
+            for post in broken_posts:
+                Post.objects.filter(pk=post['id']).update(
+                    likes_count=post['actual_likes_count'],
+                    comments_count=post['actual_comments_count'],
+                )
+            for tag in broken_tags:
+                Tag.objects.filter(pk=tag['id']).update(posts_count=tag['actual_posts_count'])
+
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
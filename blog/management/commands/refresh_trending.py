@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blog import sidebar
+from blog.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинг постов в тренде для тех постов, что изменились с прошлого раза'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать все посты заново, например после смены TRENDING_HALF_LIFE_HOURS',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Не выходить, а повторять пересчёт каждые столько секунд',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            refreshed, top_changed = refresh_trending(full=full, batch_size=options['batch_size'])
+            if top_changed:
+                sidebar.bump_version()
+            top_state = 'поменялись' if top_changed else 'те же'
+            self.stdout.write(f'Пересчитано постов: {refreshed}, первые места {top_state}')
+
+            if not options['interval']:
+                break
+            full = False
+            connections.close_all()
+            time.sleep(options['interval'])
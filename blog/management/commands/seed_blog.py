@@ -0,0 +1,141 @@
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from blog.models import Comment, Post, Tag
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими постами, комментариями, лайками и тегами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--likes', type=int, default=20000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument(
+            '--max-tags-per-post',
+            type=int,
+            default=3,
+        )
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.1,
+            help='Показатель распределения Ципфа для популярности тегов',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--prefix',
+            default='seed',
+            help='Префикс имён пользователей, тегов и слагов, чтобы данные разных прогонов не пересекались',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить данные, созданные раньше с тем же префиксом',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        prefix = options['prefix']
+        now = timezone.now()
+
+        with transaction.atomic():
+            if options['clear']:
+                self.clear(prefix)
+
+            users = User.objects.bulk_create(
+                [
+                    User(username=f'{prefix}_user_{number}', is_staff=True)
+                    for number in range(options['users'])
+                ],
+                batch_size=batch_size,
+            )
+            user_ids = [user.pk for user in users]
+
+            tags = Tag.objects.bulk_create(
+                [Tag(title=f'{prefix}-tag-{number}') for number in range(options['tags'])],
+                batch_size=batch_size,
+            )
+            tag_ids = [tag.pk for tag in tags]
+
+            posts = Post.objects.bulk_create(
+                [
+                    Post(
+                        title=f'Пост номер {number}',
+                        text=' '.join(rnd.choices(WORDS, k=rnd.randint(50, 1500))),
+                        slug=f'{prefix}-post-{number}',
+                        image='',
+                        published_at=now - timedelta(minutes=rnd.randint(0, 365 * 24 * 60)),
+                        author_id=rnd.choice(user_ids),
+                    )
+                    for number in range(options['posts'])
+                ],
+                batch_size=batch_size,
+            )
+            post_ids = [post.pk for post in posts]
+
+            tag_weights = list(accumulate(1 / rank ** options['zipf'] for rank in range(1, len(tag_ids) + 1)))
+            post_tags = set()
+            for post_id in post_ids:
+                tags_amount = rnd.randint(1, options['max_tags_per_post'])
+                for tag_id in rnd.choices(tag_ids, cum_weights=tag_weights, k=tags_amount):
+                    post_tags.add((post_id, tag_id))
+            Post.tags.through.objects.bulk_create(
+                [Post.tags.through(post_id=post_id, tag_id=tag_id) for post_id, tag_id in post_tags],
+                batch_size=batch_size,
+            )
+
+            likes = {
+                (rnd.choice(post_ids), rnd.choice(user_ids))
+                for __ in range(options['likes'])
+            }
+            Post.likes.through.objects.bulk_create(
+                [Post.likes.through(post_id=post_id, user_id=user_id) for post_id, user_id in likes],
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+
+            Comment.objects.bulk_create(
+                [
+                    Comment(
+                        post_id=rnd.choice(post_ids),
+                        author_id=rnd.choice(user_ids),
+                        text=' '.join(rnd.choices(WORDS, k=rnd.randint(5, 60))),
+                        published_at=now - timedelta(minutes=rnd.randint(0, 365 * 24 * 60)),
+                    )
+                    for __ in range(options['comments'])
+                ],
+                batch_size=batch_size,
+            )
+
+            call_command('recount_counters', stdout=self.stdout)
+            call_command('rebuild_related_posts', stdout=self.stdout)
+            call_command('refresh_trending', full=True, stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {len(users)} пользователей, {len(tags)} тегов, {len(posts)} постов, '
+            f'{len(likes)} лайков, {options["comments"]} комментариев'
+        ))
+
+    def clear(self, prefix):
+        # posts go first so that their comments and likes are deleted with them
+        Post.objects.filter(slug__startswith=f'{prefix}-post-').delete()
+        Tag.objects.filter(title__startswith=f'{prefix}-tag-').delete()
+        User.objects.filter(username__startswith=f'{prefix}_user_').delete()
+
+
+WORDS = (
+    'бизнес успех деньги жизнь дети воспитание совет опыт рынок клиент '
+    'продажи команда время цель решение проект рост идея план работа'
+).split()
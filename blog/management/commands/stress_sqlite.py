@@ -0,0 +1,188 @@
+import json
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.sqlite3.base import FORMAT_QMARK_REGEX
+from django.utils import timezone
+
+from blog.management.commands.bench_views import summarize
+from blog.models import Post, Tag
+from blog.sqlite import apply_pragmas
+
+
+WRITE_SQL = 'UPDATE blog_post SET updated_at = ? WHERE id = ?'
+
+PROFILES = {
+    # what Django does out of the box: rollback journal, a new connection per request
+    'default': {
+        'journal_mode': 'DELETE',
+        'pragmas': {},
+        'persistent': False,
+    },
+    'tuned': {
+        'journal_mode': 'WAL',
+        'pragmas': settings.SQLITE_TUNED_PRAGMAS,
+        'persistent': True,
+    },
+}
+
+
+def to_raw_sql(queryset):
+    sql, params = queryset.query.sql_with_params()
+    return FORMAT_QMARK_REGEX.sub('?', sql).replace('%%', '%'), params
+
+
+class Worker(threading.Thread):
+    def __init__(self, path, profile, operation, stop_at, seed):
+        super().__init__(daemon=True)
+        self.path = path
+        self.profile = profile
+        self.operation = operation
+        self.stop_at = stop_at
+        self.rnd = random.Random(seed)
+        self.latencies = []
+        self.errors = 0
+
+    def connect(self):
+        db_connection = sqlite3.connect(self.path, isolation_level=None)
+        apply_pragmas(db_connection, self.profile['pragmas'])
+        return db_connection
+
+    def run(self):
+        db_connection = self.connect() if self.profile['persistent'] else None
+        while time.monotonic() < self.stop_at:
+            started_at = time.perf_counter()
+            try:
+                if self.profile['persistent']:
+                    self.operation(db_connection, self.rnd)
+                else:
+                    request_connection = self.connect()
+                    try:
+                        self.operation(request_connection, self.rnd)
+                    finally:
+                        request_connection.close()
+            except sqlite3.OperationalError:
+                # "database is locked" after the busy timeout ran out
+                self.errors += 1
+                continue
+            self.latencies.append(time.perf_counter() - started_at)
+        if db_connection is not None:
+            db_connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Нагружает копию базы SQLite одновременными чтениями и записями и сравнивает профили подключения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5, help='Сколько секунд гонять каждый профиль')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--profile',
+            choices=[*PROFILES, 'both'],
+            default='both',
+        )
+        parser.add_argument('--output', help='Файл для JSON с результатами')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite')
+
+        post_ids = list(Post.objects.values_list('id', flat=True))
+        tag_titles = list(Tag.objects.values_list('title', flat=True))
+        if not post_ids:
+            raise CommandError('В базе нет постов, заполните её командой seed_blog')
+
+        # the same queries the index and tag pages start with
+        page_size = settings.POSTS_PER_PAGE
+        fresh_posts_sql = to_raw_sql(Post.objects.for_cards().order_by('-published_at', '-id')[:page_size])
+        popular_posts_sql = to_raw_sql(Post.objects.trending(5).for_cards())
+        tag_posts_sql = [
+            to_raw_sql(Post.objects.filter(tags__title=title).for_cards().order_by('-published_at', '-id')[:20])
+            for title in tag_titles[:50]
+        ]
+
+        def read(db_connection, rnd):
+            queries = [fresh_posts_sql, popular_posts_sql]
+            if tag_posts_sql:
+                queries.append(rnd.choice(tag_posts_sql))
+            for sql, params in queries:
+                db_connection.execute(sql, params).fetchall()
+
+        def write(db_connection, rnd):
+            db_connection.execute('BEGIN IMMEDIATE')
+            try:
+                updated_at = connection.ops.adapt_datetimefield_value(timezone.now())
+                db_connection.execute(WRITE_SQL, (updated_at, rnd.choice(post_ids)))
+            except sqlite3.Error:
+                db_connection.execute('ROLLBACK')
+                raise
+            db_connection.execute('COMMIT')
+
+        results = {
+            'posts': len(post_ids),
+            'readers': options['readers'],
+            'writers': options['writers'],
+            'duration': options['duration'],
+            'profiles': {},
+        }
+        profile_names = list(PROFILES) if options['profile'] == 'both' else [options['profile']]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name in profile_names:
+                path = str(Path(tmp_dir) / f'{name}.sqlite3')
+                self.copy_database(path, PROFILES[name]['journal_mode'])
+                results['profiles'][name] = self.run_profile(path, PROFILES[name], read, write, options)
+
+        report = json.dumps(results, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(report)
+        self.stdout.write(report)
+
+    def copy_database(self, path, journal_mode):
+        # the journal mode is stored in the file, so every profile gets its own copy
+        source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+        target = sqlite3.connect(path)
+        try:
+            source.backup(target)
+            target.execute(f'PRAGMA journal_mode = {journal_mode}')
+        finally:
+            source.close()
+            target.close()
+
+    def run_profile(self, path, profile, read, write, options):
+        stop_at = time.monotonic() + options['duration']
+        readers = [
+            Worker(path, profile, read, stop_at, options['seed'] + number)
+            for number in range(options['readers'])
+        ]
+        writers = [
+            Worker(path, profile, write, stop_at, options['seed'] - number - 1)
+            for number in range(options['writers'])
+        ]
+        for worker in [*readers, *writers]:
+            worker.start()
+        for worker in [*readers, *writers]:
+            worker.join()
+
+        return {
+            'reads': self.summarize_workers(readers, options['duration']),
+            'writes': self.summarize_workers(writers, options['duration']),
+        }
+
+    def summarize_workers(self, workers, duration):
+        latencies = [latency for worker in workers for latency in worker.latencies]
+        return {
+            'done': len(latencies),
+            'per_second': round(len(latencies) / duration, 1),
+            'errors': sum(worker.errors for worker in workers),
+            'latency_ms': summarize(latencies, 1000) if latencies else None,
+        }
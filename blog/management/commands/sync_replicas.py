@@ -0,0 +1,30 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в файлы реплик из DATABASE_REPLICA_FILEPATHS'
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены, укажите DATABASE_REPLICA_FILEPATHS')
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Команда копирует только базы SQLite, реплики других СУБД настраиваются в самой СУБД')
+
+        # stands in for real replication when the site is run locally
+        source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                connections[alias].close()
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'{alias}: {settings.DATABASES[alias]["NAME"]}')
+        finally:
+            source.close()
+        self.stdout.write(self.style.SUCCESS('Реплики обновлены'))
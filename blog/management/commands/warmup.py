@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.warmup import warmup
+
+
+class Command(BaseCommand):
+    help = 'Компилирует шаблоны, загружает адреса и заполняет кэши сайдбара и карточек постов'
+
+    def handle(self, *args, **options):
+        total = 0
+        for name, count, duration in warmup():
+            total += duration
+            self.stdout.write(f'{name}: {count}, {duration * 1000:.0f} мс')
+        self.stdout.write(self.style.SUCCESS(f'Прогрев занял {total * 1000:.0f} мс'))
@@ -0,0 +1,193 @@
+import logging
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+
+from blog.profiling import RequestProfile, should_profile
+from blog.query_budget import check_query_budget
+from blog.routers import read_from_replica
+from blog.staticfiles import load_static_files, serve_static_file
+from blog.timing import collect_timings, install_render_timer
+
+
+logger = logging.getLogger('blog.timing')
+profiling_logger = logging.getLogger('blog.profiling')
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        install_render_timer()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with collect_timings() as timings:
+            started_at = time.perf_counter()
+            response = self.get_response(request)
+            view_duration = time.perf_counter() - started_at
+        return self.report(request, response, timings, view_duration)
+
+    async def __acall__(self, request):
+        with collect_timings() as timings:
+            started_at = time.perf_counter()
+            response = await self.get_response(request)
+            view_duration = time.perf_counter() - started_at
+        return self.report(request, response, timings, view_duration)
+
+    def report(self, request, response, timings, view_duration):
+        sql_ms = timings.sql_duration * 1000
+        render_ms = timings.render_duration * 1000
+        view_ms = view_duration * 1000
+        response['Server-Timing'] = ', '.join([
+            f'sql;dur={sql_ms:.2f};desc="{timings.sql_queries} queries"',
+            f'render;dur={render_ms:.2f}',
+            f'view;dur={view_ms:.2f}',
+        ])
+
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        logger.info(
+            '%s %s %s',
+            request.method,
+            request.path,
+            response.status_code,
+            extra={
+                'url_name': url_name,
+                'status_code': response.status_code,
+                'sql_queries': timings.sql_queries,
+                'sql_ms': round(sql_ms, 2),
+                'render_ms': round(render_ms, 2),
+                'view_ms': round(view_ms, 2),
+            },
+        )
+
+        if url_name:
+            check_query_budget(url_name, timings.sql_queries)
+        return response
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILE_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not should_profile(request):
+            return self.get_response(request)
+        with RequestProfile(request) as profile:
+            response = self.get_response(request)
+        return self.report(profile, response)
+
+    async def __acall__(self, request):
+        if not should_profile(request):
+            return await self.get_response(request)
+        # other requests served by the same event loop end up in the profile too
+        with RequestProfile(request) as profile:
+            response = await self.get_response(request)
+        return self.report(profile, response)
+
+    def report(self, profile, response):
+        name = profile.save()
+        response['X-Profile-Id'] = name
+        profiling_logger.info('profile %s saved to %s', name, settings.PROFILE_DIR)
+        return response
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+    sticky_cookie = 'read_primary'
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not self.can_use_replica(request):
+            return self.stick_to_primary(request, self.get_response(request))
+        with read_from_replica() as state:
+            response = self.get_response(request)
+        return self.stick_to_primary(request, response, state.wrote)
+
+    async def __acall__(self, request):
+        if not self.can_use_replica(request):
+            return self.stick_to_primary(request, await self.get_response(request))
+        with read_from_replica() as state:
+            response = await self.get_response(request)
+        return self.stick_to_primary(request, response, state.wrote)
+
+    def can_use_replica(self, request):
+        if request.method not in ('GET', 'HEAD') or self.sticky_cookie in request.COOKIES:
+            return False
+        return not request.path.startswith(reverse('admin:index'))
+
+    def stick_to_primary(self, request, response, wrote=False):
+        # replicas lag behind, so whoever has just written reads from the primary for a while
+        if wrote or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(
+                self.sticky_cookie,
+                '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class StaticFilesMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVE_STATIC or not settings.STATIC_ROOT or not os.path.isdir(settings.STATIC_ROOT):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        # collectstatic runs before the server starts, so the files are listed once
+        self.static_files = load_static_files()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        static_file = self.find_static_file(request)
+        if static_file is not None:
+            return serve_static_file(request, static_file)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        static_file = self.find_static_file(request)
+        if static_file is not None:
+            return serve_static_file(request, static_file)
+        return await self.get_response(request)
+
+    def find_static_file(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(settings.STATIC_URL):
+            return None
+        return self.static_files.get(request.path[len(settings.STATIC_URL):])
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.5 on 2026-10-18 16:34
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Tag = apps.get_model('blog', 'Tag')
+
+    posts = Post.objects.annotate(
+        actual_likes_count=Count('likes', distinct=True),
+        actual_comments_count=Count('comments', distinct=True),
+    )
+    for post in posts.iterator():
+        Post.objects.filter(pk=post.pk).update(
+            likes_count=post.actual_likes_count,
+            comments_count=post.actual_comments_count,
+        )
+
+    for tag in Tag.objects.annotate(actual_posts_count=Count('posts')).iterator():
+        Tag.objects.filter(pk=tag.pk).update(posts_count=tag.actual_posts_count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_remove_tag_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Количество лайков'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='posts_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Количество постов'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='blog.post', verbose_name='Пост, к которому написан'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 16:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['published_at', 'id'], name='post_published_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'published_at', 'id'], name='comment_post_published_at_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.5 on 2026-10-18 17:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0019_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Похожесть')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='blog.post', verbose_name='Пост')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_by', to='blog.post', verbose_name='Похожий пост')),
+            ],
+            options={
+                'verbose_name': 'похожий пост',
+                'verbose_name_plural': 'похожие посты',
+                'indexes': [models.Index(fields=['post', '-score'], name='related_post_score_idx')],
+            },
+        ),
+    ]
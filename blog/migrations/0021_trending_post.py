@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-18 17:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0020_related_post'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='blog.post', verbose_name='Пост')),
+                ('score', models.FloatField(verbose_name='Рейтинг')),
+                ('likes_count', models.PositiveIntegerField(verbose_name='Учтено лайков')),
+                ('comments_count', models.PositiveIntegerField(verbose_name='Учтено комментариев')),
+                ('refreshed_at', models.DateTimeField(db_index=True, verbose_name='Дата и время пересчёта')),
+            ],
+            options={
+                'verbose_name': 'пост в тренде',
+                'verbose_name_plural': 'посты в тренде',
+                'indexes': [models.Index(fields=['-score'], name='trending_post_score_idx')],
+            },
+        ),
+    ]
@@ -1,46 +1,123 @@
 from django.db import models
 from django.urls import reverse
 from django.contrib.auth.models import User
-from django.db.models import Count, Prefetch
+from django.db.models import Count, F, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce, Now, Substr
 
 
-class PostQuerySet(models.QuerySet):
-    def popular(self):
-        popular_posts = self.annotate(
-            total_likes=Count('likes', distinct=True),
-        ).order_by('-total_likes')
-        return popular_posts
+TEASER_LENGTH = 200
+
 
-    def fetch_with_total_comments(self):
-        popular_posts_ids = [post.id for post in self]
+def count_related(model, field_name):
+    related = model.objects.filter(**{field_name: OuterRef('pk')}) \
+        .order_by() \
+        .values(field_name) \
+        .annotate(count=Count('*')) \
+        .values('count')
+    return Coalesce(Subquery(related), 0)
 
-        posts_with_comments = Post.objects.filter(id__in=popular_posts_ids).annotate(total_comments=Count('comments'))
-        ids_and_comments = posts_with_comments.values_list('id', 'total_comments')
-        count_for_id = dict(ids_and_comments)
 
-        for post in self:
-            post.total_comments = count_for_id[post.id]
+class PostQuerySet(models.QuerySet):
+    def popular(self):
+        return self.order_by('-likes_count', '-id')
 
-        return list(self)
+    def trending(self, limit):
+        # the top is read from the score index first, so only `limit` posts are joined
+        top_post_ids = TrendingPost.objects.order_by('-score').values('post_id')[:limit]
+        return self.filter(pk__in=top_post_ids).order_by('-trending__score')
 
     def fetch_posts_count_for_tags(self):
         return self.prefetch_related(
-            Prefetch('tags', queryset=Tag.objects.annotate(Count('posts')))
+            Prefetch('tags', queryset=Tag.objects.only('title', 'posts_count'))
+        )
+
+    def for_cards(self):
+        return self.select_related('author') \
+            .only(
+                'title',
+                'teaser',
+                'slug',
+                'image',
+                'image_variants',
+                'published_at',
+                'comments_count',
+                'author__username',
+            ) \
+            .fetch_posts_count_for_tags()
+
+    def fill_teasers(self):
+        return self.update(teaser=Substr('text', 1, TEASER_LENGTH))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for post in objs:
+            post.teaser = post.make_teaser()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def with_actual_counts(self):
+        return self.annotate(
+            actual_likes_count=count_related(Post.likes.through, 'post'),
+            actual_comments_count=count_related(Comment, 'post'),
         )
 
 
 class TagQuerySet(models.QuerySet):
     def popular(self):
-        popular_tags = self.annotate(Count('posts')).order_by('-posts__count')
-        return popular_tags
+        return self.order_by('-posts_count', 'title')
+
+    def with_actual_counts(self):
+        return self.annotate(actual_posts_count=Count('posts'))
+
+
+class CommentQuerySet(models.QuerySet):
+    def bulk_create(self, objs, batch_size=None, ignore_conflicts=False, update_conflicts=False, **kwargs):
+        comments = super().bulk_create(
+            objs,
+            batch_size=batch_size,
+            ignore_conflicts=ignore_conflicts,
+            update_conflicts=update_conflicts,
+            **kwargs,
+        )
+
+        if ignore_conflicts or update_conflicts:
+            # the rows that were skipped or updated come back too, so the
+            # counters of their posts are taken from the table
+            Post.objects.filter(pk__in={comment.post_id for comment in comments}).update(
+                comments_count=count_related(Comment, 'post'),
+                updated_at=Now(),
+            )
+            return comments
+
+        added_for_post = {}
+        for comment in comments:
+            added_for_post[comment.post_id] = added_for_post.get(comment.post_id, 0) + 1
+        for post_id, added in added_for_post.items():
+            Post.objects.filter(pk=post_id).update(
+                comments_count=F('comments_count') + added,
+                updated_at=Now(),
+            )
+
+        return comments
 
 
 class Post(models.Model):
     title = models.CharField('Заголовок', max_length=200)
     text = models.TextField('Текст')
+    teaser = models.CharField('Анонс', max_length=TEASER_LENGTH, blank=True, editable=False)
     slug = models.SlugField('Название в виде url', max_length=200)
     image = models.ImageField('Картинка')
+    image_variants = models.JSONField('Уменьшенные копии картинки', default=dict, blank=True, editable=False)
     published_at = models.DateTimeField('Дата и время публикации')
+    likes_count = models.PositiveIntegerField(
+        'Количество лайков',
+        default=0,
+        db_index=True,
+        editable=False)
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False)
+    updated_at = models.DateTimeField('Дата и время изменения', auto_now=True, db_index=True)
 
     author = models.ForeignKey(
         User,
@@ -62,17 +139,35 @@ class Post(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, update_fields=None, **kwargs):
+        self.teaser = self.make_teaser()
+        if update_fields is not None and 'text' in update_fields:
+            update_fields = {*update_fields, 'teaser'}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+    def make_teaser(self):
+        return self.text[:TEASER_LENGTH]
+
     def get_absolute_url(self):
         return reverse('post_detail', args={'slug': self.slug})
 
     class Meta:
         ordering = ['-published_at']
+        indexes = [
+            models.Index(fields=['published_at', 'id'], name='post_published_at_id_idx'),
+        ]
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
 
 
 class Tag(models.Model):
     title = models.CharField('Тег', max_length=20, unique=True)
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        db_index=True,
+        editable=False)
+    updated_at = models.DateTimeField('Дата и время изменения', auto_now=True)
 
     objects = TagQuerySet.as_manager()
 
@@ -105,11 +200,67 @@ class Comment(models.Model):
 
     text = models.TextField('Текст комментария')
     published_at = models.DateTimeField('Дата и время публикации')
+    updated_at = models.DateTimeField('Дата и время изменения', auto_now=True)
+
+    objects = CommentQuerySet.as_manager()
 
     def __str__(self):
         return f'{self.author.username} under {self.post.title}'
 
     class Meta:
         ordering = ['published_at']
+        indexes = [
+            models.Index(fields=['post', 'published_at', 'id'], name='comment_post_published_at_idx'),
+        ]
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
+
+
+class RelatedPost(models.Model):
+    post = models.ForeignKey(
+        'Post',
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='related_links'
+    )
+    related = models.ForeignKey(
+        'Post',
+        on_delete=models.CASCADE,
+        verbose_name='Похожий пост',
+        related_name='related_by'
+    )
+    score = models.FloatField('Похожесть')
+
+    def __str__(self):
+        return f'{self.post_id} -> {self.related_id}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', '-score'], name='related_post_score_idx'),
+        ]
+        verbose_name = 'похожий пост'
+        verbose_name_plural = 'похожие посты'
+
+
+class TrendingPost(models.Model):
+    post = models.OneToOneField(
+        'Post',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Пост',
+        related_name='trending'
+    )
+    score = models.FloatField('Рейтинг')
+    likes_count = models.PositiveIntegerField('Учтено лайков')
+    comments_count = models.PositiveIntegerField('Учтено комментариев')
+    refreshed_at = models.DateTimeField('Дата и время пересчёта', db_index=True)
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='trending_post_score_idx'),
+        ]
+        verbose_name = 'пост в тренде'
+        verbose_name_plural = 'посты в тренде'
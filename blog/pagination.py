@@ -0,0 +1,65 @@
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from django.db.models import Q
+
+
+KeysetPage = namedtuple('KeysetPage', ['items', 'prev_cursor', 'next_cursor'])
+
+
+def get_key_value(item, field):
+    if isinstance(item, dict):
+        return item[field]
+    return getattr(item, field)
+
+
+def encode_cursor(item, date_field='published_at'):
+    published_at = get_key_value(item, date_field)
+    timestamp = int(published_at.timestamp() * 1_000_000)
+    return f'{timestamp}-{get_key_value(item, "id")}'
+
+
+def decode_cursor(cursor):
+    timestamp, pk = cursor.split('-')
+    published_at = datetime.fromtimestamp(int(timestamp) / 1_000_000, tz=timezone.utc)
+    return published_at, int(pk)
+
+
+def order_by_keyset(queryset, cursor=None, date_field='published_at', moving_down=True):
+    ordering = [f'-{date_field}', '-id'] if moving_down else [date_field, 'id']
+    queryset = queryset.order_by(*ordering)
+
+    if cursor:
+        published_at, pk = decode_cursor(cursor)
+        lookup = 'lt' if moving_down else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__{lookup}': published_at})
+            | Q(**{date_field: published_at, f'id__{lookup}': pk})
+        )
+    return queryset
+
+
+def paginate_by_keyset(queryset, per_page, after=None, before=None,
+                       date_field='published_at', descending=True):
+    backwards = bool(before)
+    cursor = before if backwards else after
+    moving_down = descending != backwards
+
+    queryset = order_by_keyset(queryset, cursor, date_field, moving_down)
+    items = list(queryset[:per_page + 1])
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    if backwards:
+        items.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = bool(after), has_more
+
+    if not items:
+        return KeysetPage(items, None, None)
+    return KeysetPage(
+        items,
+        encode_cursor(items[0], date_field) if has_prev else None,
+        encode_cursor(items[-1], date_field) if has_next else None,
+    )
@@ -0,0 +1,102 @@
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+
+
+TOKEN_SALT = 'blog.profiling'
+TOKEN_VALUE = 'profile'
+
+
+def make_profile_token():
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(TOKEN_VALUE)
+
+
+def is_valid_profile_token(token):
+    try:
+        value = signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return value == TOKEN_VALUE
+
+
+def should_profile(request):
+    token = request.headers.get('X-Profile')
+    if token:
+        return is_valid_profile_token(token)
+    return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+def get_frame_name(frame):
+    code = frame.f_code
+    file_name = code.co_filename
+    if file_name.startswith(str(settings.BASE_DIR)):
+        file_name = os.path.relpath(file_name, settings.BASE_DIR)
+    else:
+        file_name = file_name.rsplit('site-packages/', 1)[-1]
+    return f'{code.co_name} ({file_name})'
+
+
+class StackSampler:
+    # looks at the stack of the request thread every few milliseconds,
+    # the collapsed stacks are what flamegraph.pl and speedscope read
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(get_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def write(self, path):
+        with open(path, 'w') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+class RequestProfile:
+    def __init__(self, request):
+        self.request = request
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL / 1000)
+
+    def __enter__(self):
+        self.sampler.start()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.sampler.stop()
+
+    def save(self):
+        resolver_match = self.request.resolver_match
+        url_name = resolver_match.url_name if resolver_match and resolver_match.url_name else 'unknown'
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{url_name}-{os.getpid()}-{threading.get_ident()}'
+
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        self.profiler.dump_stats(os.path.join(settings.PROFILE_DIR, f'{name}.prof'))
+        self.sampler.write(os.path.join(settings.PROFILE_DIR, f'{name}.collapsed'))
+        return name
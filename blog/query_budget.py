@@ -0,0 +1,61 @@
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+QUERY_BUDGETS = {}
+
+budgets_enforced = ContextVar('budgets_enforced', default=False)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def register_query_budget(url_name, max_queries):
+    QUERY_BUDGETS[url_name] = max_queries
+
+
+@contextmanager
+def enforce_query_budgets():
+    token = budgets_enforced.set(True)
+    try:
+        yield
+    finally:
+        budgets_enforced.reset(token)
+
+
+def query_budget(url_name):
+    # the budgets are registered below only, the decorator makes a test enforce them
+    if url_name not in QUERY_BUDGETS:
+        raise KeyError(f'no query budget registered for {url_name}')
+
+    def decorator(test):
+        @functools.wraps(test)
+        def wrapper(*args, **kwargs):
+            with enforce_query_budgets():
+                return test(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def check_query_budget(url_name, sql_queries):
+    if not budgets_enforced.get():
+        return
+    max_queries = QUERY_BUDGETS.get(url_name)
+    if max_queries is not None and sql_queries > max_queries:
+        raise QueryBudgetExceeded(
+            f'{url_name} made {sql_queries} SQL queries, budget is {max_queries}'
+        )
+
+
+register_query_budget('index', 8)
+# a logged in reader adds the session, the user and whether they liked the post
+register_query_budget('post_detail', 10)
+register_query_budget('tag_filter', 9)
+register_query_budget('post_comments', 4)
+register_query_budget('post_like', 5)
+register_query_budget('search', 8)
+register_query_budget('contacts', 0)
+register_query_budget('blog_post_changelist', 6)
+register_query_budget('blog_comment_changelist', 5)
@@ -0,0 +1,148 @@
+import heapq
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from blog.models import Post, RelatedPost, Tag
+
+
+PostTag = Post.tags.through
+
+
+def load_tag_weights():
+    # idf of a tag: the rarer the tag, the more two posts sharing it have in common
+    total_posts = Post.objects.count()
+    return {
+        tag_id: math.log((1 + total_posts) / (1 + posts_count)) + 1
+        for tag_id, posts_count in Tag.objects.values_list('id', 'posts_count')
+    }
+
+
+def load_common_tag_ids():
+    # a tag on most of the posts brings a lot of candidates and little similarity
+    return set(
+        Tag.objects.filter(posts_count__gt=settings.RELATED_POSTS_MAX_TAG_POSTS).values_list('id', flat=True)
+    )
+
+
+def get_similarity(tag_ids, other_tag_ids, tag_weights):
+    # Jaccard similarity of the tag sets, every tag counted with its idf weight
+    shared_tag_ids = tag_ids & other_tag_ids
+    if not shared_tag_ids:
+        return 0
+    shared_weight = sum(tag_weights.get(tag_id, 1) for tag_id in shared_tag_ids)
+    total_weight = sum(tag_weights.get(tag_id, 1) for tag_id in tag_ids | other_tag_ids)
+    return shared_weight / total_weight
+
+
+def find_related(post_id, tags_for_post, posts_for_tag, tag_weights, common_tag_ids):
+    tag_ids = tags_for_post.get(post_id, set())
+    candidate_ids = set()
+    for tag_id in tag_ids - common_tag_ids:
+        candidate_ids.update(posts_for_tag[tag_id])
+    candidate_ids.discard(post_id)
+
+    scored = (
+        (get_similarity(tag_ids, tags_for_post[candidate_id], tag_weights), candidate_id)
+        for candidate_id in candidate_ids
+    )
+    return heapq.nlargest(settings.RELATED_POSTS_COUNT, scored)
+
+
+def make_links(post_id, related):
+    return [
+        RelatedPost(post_id=post_id, related_id=related_id, score=score)
+        for score, related_id in related
+    ]
+
+
+def load_post_tags(links):
+    tags_for_post = defaultdict(set)
+    posts_for_tag = defaultdict(set)
+    for post_id, tag_id in links:
+        tags_for_post[post_id].add(tag_id)
+        posts_for_tag[tag_id].add(post_id)
+    return tags_for_post, posts_for_tag
+
+
+def rebuild_related_posts(batch_size=1000):
+    tag_weights = load_tag_weights()
+    common_tag_ids = load_common_tag_ids()
+    tags_for_post, posts_for_tag = load_post_tags(
+        PostTag.objects.values_list('post_id', 'tag_id').iterator(chunk_size=batch_size * 10)
+    )
+
+    links_count = 0
+    with transaction.atomic():
+        RelatedPost.objects.all().delete()
+        batch = []
+        for post_id in tags_for_post:
+            related = find_related(post_id, tags_for_post, posts_for_tag, tag_weights, common_tag_ids)
+            batch.extend(make_links(post_id, related))
+            if len(batch) >= batch_size:
+                RelatedPost.objects.bulk_create(batch)
+                links_count += len(batch)
+                batch = []
+        RelatedPost.objects.bulk_create(batch)
+        links_count += len(batch)
+    return links_count
+
+
+def update_related_posts(post_ids):
+    # the changed posts get their lists computed again, every other post only
+    # gets its score against the changed ones updated, so a post that drops out
+    # of a list is not replaced and idf weights drift until the next full rebuild
+    post_ids = set(Post.objects.filter(pk__in=post_ids).values_list('id', flat=True))
+    if not post_ids:
+        return
+
+    tag_weights = load_tag_weights()
+    common_tag_ids = load_common_tag_ids()
+    changed_tag_ids = set(PostTag.objects.filter(post_id__in=post_ids).values_list('tag_id', flat=True))
+    changed_tag_ids -= common_tag_ids
+    neighbour_ids = set(PostTag.objects.filter(tag_id__in=changed_tag_ids).values_list('post_id', flat=True))
+    neighbour_ids |= set(RelatedPost.objects.filter(related_id__in=post_ids).values_list('post_id', flat=True))
+    neighbour_ids -= post_ids
+
+    tags_for_post, posts_for_tag = load_post_tags(
+        PostTag.objects.filter(post_id__in=post_ids | neighbour_ids).values_list('post_id', 'tag_id')
+    )
+    current_lists = defaultdict(list)
+    for post_id, related_id, score in RelatedPost.objects \
+            .filter(post_id__in=neighbour_ids) \
+            .values_list('post_id', 'related_id', 'score'):
+        current_lists[post_id].append((score, related_id))
+
+    new_lists = {
+        post_id: find_related(post_id, tags_for_post, posts_for_tag, tag_weights, common_tag_ids)
+        for post_id in post_ids
+    }
+    for post_id in neighbour_ids:
+        related = [(score, related_id) for score, related_id in current_lists[post_id] if related_id not in post_ids]
+        for changed_post_id in post_ids:
+            if not (tags_for_post[post_id] & tags_for_post[changed_post_id]) - common_tag_ids:
+                continue
+            score = get_similarity(tags_for_post[post_id], tags_for_post[changed_post_id], tag_weights)
+            related.append((score, changed_post_id))
+        related = heapq.nlargest(settings.RELATED_POSTS_COUNT, related)
+        if sorted(related) != sorted(current_lists[post_id]):
+            new_lists[post_id] = related
+
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=new_lists).delete()
+        RelatedPost.objects.bulk_create([
+            link
+            for post_id, related in new_lists.items()
+            for link in make_links(post_id, related)
+        ])
+
+
+def get_related_posts(post_id):
+    related_posts = Post.objects \
+        .filter(related_by__post_id=post_id) \
+        .order_by('-related_by__score') \
+        .values('title', 'slug', 'published_at', author_username=F('author__username'))
+    return list(related_posts[:settings.RELATED_POSTS_COUNT])
@@ -0,0 +1,51 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+PRIMARY_DATABASE = 'default'
+
+current_read_state = ContextVar('current_read_state', default=None)
+
+
+class ReadState:
+    def __init__(self, alias):
+        self.alias = alias
+        self.wrote = False
+
+
+@contextmanager
+def read_from_replica():
+    state = ReadState(random.choice(settings.DATABASE_REPLICAS))
+    token = current_read_state.set(state)
+    try:
+        yield state
+    finally:
+        current_read_state.reset(token)
+
+
+class ReplicaRouter:
+    # only requests wrapped in read_from_replica read from a replica,
+    # management commands, background threads and admin stay on the primary
+
+    def db_for_read(self, model, **hints):
+        state = current_read_state.get()
+        if state is None or state.wrote or model._meta.app_label != 'blog':
+            return None
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = current_read_state.get()
+        if state is not None:
+            # the rest of the request has to see what it has just written
+            state.wrote = True
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # replicas get the schema together with the data from the primary
+        return db == PRIMARY_DATABASE
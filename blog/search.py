@@ -0,0 +1,123 @@
+from collections import namedtuple
+
+from django.db import NotSupportedError, connections, router
+from django.utils.html import escape
+
+from blog.models import Post
+
+
+SearchHit = namedtuple('SearchHit', ['post_id', 'score', 'snippet'])
+
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+SEARCH_SQL = """
+    SELECT post_id, score, snippet FROM (
+        SELECT
+            rowid AS post_id,
+            bm25(blog_post_fts, 10.0, 1.0) AS score,
+            snippet(blog_post_fts, -1, %s, %s, '…', 24) AS snippet
+        FROM blog_post_fts
+        WHERE blog_post_fts MATCH %s
+    )
+    {cursor_filter}
+    ORDER BY score, post_id
+    LIMIT %s
+"""
+
+# the triggers of migration 0016, SQLite drops them with the table whenever a
+# migration makes Django rebuild blog_post
+SEARCH_TRIGGERS_SQL = {
+    'blog_post_fts_insert': """
+    CREATE TRIGGER IF NOT EXISTS blog_post_fts_insert AFTER INSERT ON blog_post BEGIN
+        INSERT INTO blog_post_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+    END
+    """,
+    'blog_post_fts_delete': """
+    CREATE TRIGGER IF NOT EXISTS blog_post_fts_delete AFTER DELETE ON blog_post BEGIN
+        INSERT INTO blog_post_fts(blog_post_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+    END
+    """,
+    'blog_post_fts_update': """
+    CREATE TRIGGER IF NOT EXISTS blog_post_fts_update AFTER UPDATE OF title, text ON blog_post BEGIN
+        INSERT INTO blog_post_fts(blog_post_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO blog_post_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+    END
+    """,
+}
+
+
+def build_match_expression(query):
+    # every word is quoted so the reader's input is never parsed as FTS5 syntax
+    words = query.split()
+    return ' '.join('"{}"'.format(word.replace('"', '""')) for word in words)
+
+
+def highlight(snippet):
+    return escape(snippet) \
+        .replace(HIGHLIGHT_START, '<mark>') \
+        .replace(HIGHLIGHT_END, '</mark>')
+
+
+def encode_search_cursor(hit):
+    return f'{hit.score!r}_{hit.post_id}'
+
+
+def decode_search_cursor(cursor):
+    score, post_id = cursor.split('_')
+    return float(score), int(post_id)
+
+
+def search_posts(query, per_page, after=None):
+    connection = connections[router.db_for_read(Post)]
+    if connection.vendor != 'sqlite':
+        raise NotSupportedError('Полнотекстовый поиск работает только на SQLite FTS5')
+
+    match_expression = build_match_expression(query)
+    if not match_expression:
+        return [], None
+
+    params = [HIGHLIGHT_START, HIGHLIGHT_END, match_expression]
+    cursor_filter = ''
+    if after:
+        score, post_id = decode_search_cursor(after)
+        cursor_filter = 'WHERE score > %s OR (score = %s AND post_id > %s)'
+        params += [score, score, post_id]
+    params.append(per_page + 1)
+
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SQL.format(cursor_filter=cursor_filter), params)
+        rows = cursor.fetchall()
+
+    hits = [
+        SearchHit(post_id, score, highlight(snippet))
+        for post_id, score, snippet in rows[:per_page]
+    ]
+    next_cursor = encode_search_cursor(hits[-1]) if len(rows) > per_page else None
+    return hits, next_cursor
+
+
+def rebuild_search_index():
+    with connections[router.db_for_write(Post)].cursor() as cursor:
+        cursor.execute("INSERT INTO blog_post_fts(blog_post_fts) VALUES ('rebuild')")
+        cursor.execute("INSERT INTO blog_post_fts(blog_post_fts) VALUES ('optimize')")
+
+
+def restore_search_triggers(using):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE name LIKE 'blog_post_fts%'")
+        existing = {(object_type, name) for object_type, name in cursor.fetchall()}
+        if ('table', 'blog_post_fts') not in existing:
+            # the migrations are not applied as far as the index yet, or were reversed
+            return []
+
+        missing = [name for name in SEARCH_TRIGGERS_SQL if ('trigger', name) not in existing]
+        for name in missing:
+            cursor.execute(SEARCH_TRIGGERS_SQL[name])
+        if missing:
+            # posts written without the triggers are missing from the index or stale in it
+            cursor.execute("INSERT INTO blog_post_fts(blog_post_fts) VALUES ('rebuild')")
+    return missing
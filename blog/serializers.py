@@ -0,0 +1,57 @@
+from django.urls import reverse
+from django.utils import formats, timezone
+
+from blog.images import serialize_image
+
+
+def serialize_post(post):
+    return {
+        'title': post.title,
+        'teaser_text': post.teaser,
+        'author': post.author.username,
+        'comments_amount': post.comments_count,
+        'image_url': post.image.url if post.image else None,
+        'image': serialize_image(post),
+        'published_at': post.published_at,
+        'slug': post.slug,
+        'tags': [serialize_tag(tag) for tag in post.tags.all()],
+        'first_tag_title': post.tags.all()[0].title,
+    }
+
+
+def serialize_post_for_json(post):
+    return {
+        'title': post.title,
+        'slug': post.slug,
+        'url': reverse('post_detail', kwargs={'slug': post.slug}),
+        'teaser_text': post.teaser,
+        'author': post.author.username,
+        'comments_amount': post.comments_count,
+        'image': serialize_image(post),
+        'published_at': post.published_at,
+        'tags': [tag.title for tag in post.tags.all()],
+    }
+
+
+def serialize_tag(tag):
+    return {
+        'title': tag.title,
+        'posts_with_tag': tag.posts_count,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'text': comment['text'],
+        'published_at': comment['published_at'],
+        'author': comment['author__username'],
+    }
+
+
+def serialize_comment_for_json(comment):
+    serialized_comment = serialize_comment(comment)
+    serialized_comment['published_at'] = formats.date_format(
+        timezone.localtime(comment['published_at']),
+        'DATETIME_FORMAT',
+    )
+    return serialized_comment
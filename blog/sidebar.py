@@ -0,0 +1,80 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from blog.models import Post, Tag
+from blog.serializers import serialize_post, serialize_tag
+
+
+VERSION_KEY = 'sidebar:version'
+LOCK_WAIT_STEP = 0.05
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, timeout=None)
+
+
+def get_cached_block(name, compute):
+    version = get_version()
+    key = f'sidebar:{name}:{version}'
+    stale_key = f'sidebar:{name}:stale'
+    lock_key = f'sidebar:{name}:{version}:lock'
+
+    block = cache.get(key)
+    if block is not None:
+        return block
+
+    waited = 0
+    while not cache.add(lock_key, True, timeout=settings.SIDEBAR_CACHE_LOCK_TIMEOUT):
+        # somebody else is already recomputing this version: serve the
+        # previous one while it is there, otherwise wait for the fresh one
+        stale_block = cache.get(stale_key)
+        if stale_block is not None:
+            return stale_block
+        block = cache.get(key)
+        if block is not None:
+            return block
+        if waited >= settings.SIDEBAR_CACHE_LOCK_TIMEOUT:
+            break
+        time.sleep(LOCK_WAIT_STEP)
+        waited += LOCK_WAIT_STEP
+
+    try:
+        block = compute()
+        cache.set_many({key: block, stale_key: block}, timeout=settings.SIDEBAR_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    return block
+
+
+def compute_popular_posts():
+    popular_posts = Post.objects.trending(5).for_cards()
+    if not popular_posts:
+        # refresh_trending has not been run yet
+        popular_posts = Post.objects.popular().for_cards()[:5]
+    return [serialize_post(post) for post in popular_posts]
+
+
+def compute_popular_tags():
+    popular_tags = Tag.objects.popular().only('title', 'posts_count')[:5]
+    return [serialize_tag(tag) for tag in popular_tags]
+
+
+def get_popular_posts():
+    return get_cached_block('popular_posts', compute_popular_posts)
+
+
+def get_popular_tags():
+    return get_cached_block('popular_tags', compute_popular_tags)
@@ -0,0 +1,175 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from blog import sidebar
+from blog.related import update_related_posts
+from blog.images import needs_variants, schedule_variants
+from blog.models import Comment, Post, Tag
+from blog.search import restore_search_triggers
+
+
+def get_m2m_sides(field, reverse):
+    source_name = field.m2m_field_name()
+    target_name = field.m2m_reverse_field_name()
+    if reverse:
+        return target_name, source_name
+    return source_name, target_name
+
+
+def change_m2m_counter(field, counter_model, counter_name, instance, reverse, pk_set, delta):
+    instance_side, __ = get_m2m_sides(field, reverse)
+    counter_side = field.m2m_field_name() if counter_model is field.model else field.m2m_reverse_field_name()
+
+    if counter_side == instance_side:
+        counter_model.objects.filter(pk=instance.pk).update(
+            **{counter_name: F(counter_name) + delta * len(pk_set)},
+            updated_at=Now(),
+        )
+    else:
+        counter_model.objects.filter(pk__in=pk_set).update(
+            **{counter_name: F(counter_name) + delta},
+            updated_at=Now(),
+        )
+
+
+def fetch_linked_ids(field, instance, reverse, pk_set=None):
+    instance_side, other_side = get_m2m_sides(field, reverse)
+
+    links = field.remote_field.through.objects.filter(**{f'{instance_side}_id': instance.pk})
+    if pk_set is not None:
+        links = links.filter(**{f'{other_side}_id__in': pk_set})
+    return set(links.values_list(f'{other_side}_id', flat=True))
+
+
+def handle_m2m_counter(field, counter_model, counter_name, action, instance, reverse, pk_set):
+    if action == 'post_add' and pk_set:
+        change_m2m_counter(field, counter_model, counter_name, instance, reverse, pk_set, 1)
+    elif action in ('pre_remove', 'pre_clear'):
+        # pk_set of remove may contain ids that are not linked, and clear
+        # passes no ids at all, so count what is actually going to be deleted
+        linked_ids = fetch_linked_ids(field, instance, reverse, pk_set)
+        if linked_ids:
+            change_m2m_counter(field, counter_model, counter_name, instance, reverse, linked_ids, -1)
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def update_likes_count(sender, action, instance, reverse, pk_set, **kwargs):
+    field = Post._meta.get_field('likes')
+    handle_m2m_counter(field, Post, 'likes_count', action, instance, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_posts_count(sender, action, instance, reverse, pk_set, **kwargs):
+    field = Post._meta.get_field('tags')
+    handle_m2m_counter(field, Tag, 'posts_count', action, instance, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def touch_tagged_posts(sender, action, instance, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    if not reverse:
+        Post.objects.filter(pk=instance.pk).update(updated_at=Now())
+        return
+    field = Post._meta.get_field('tags')
+    post_ids = pk_set if action == 'post_add' else fetch_linked_ids(field, instance, reverse, pk_set)
+    if post_ids:
+        Post.objects.filter(pk__in=post_ids).update(updated_at=Now())
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def schedule_related_posts_update(sender, action, instance, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        post_ids = {instance.pk}
+    elif action == 'pre_clear':
+        post_ids = fetch_linked_ids(Post._meta.get_field('tags'), instance, reverse)
+    else:
+        post_ids = set(pk_set)
+    if post_ids:
+        transaction.on_commit(lambda: update_related_posts(post_ids))
+
+
+@receiver(pre_delete, sender=Tag)
+def schedule_related_posts_update_for_tag(sender, instance, **kwargs):
+    post_ids = set(Post.objects.filter(tags=instance).values_list('id', flat=True))
+    if post_ids:
+        transaction.on_commit(lambda: update_related_posts(post_ids))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_posts_of_tag(sender, instance, raw=False, created=False, **kwargs):
+    # post cards show tag titles, so a renamed or deleted tag changes them
+    if raw or created:
+        return
+    Post.objects.filter(tags=instance).update(updated_at=Now())
+
+
+@receiver(post_save, sender=Post)
+def make_image_variants(sender, instance, raw, **kwargs):
+    if not raw and needs_variants(instance):
+        schedule_variants(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def release_post_tags(sender, instance, **kwargs):
+    Tag.objects.filter(posts=instance).update(posts_count=F('posts_count') - 1, updated_at=Now())
+
+
+@receiver(pre_delete, sender=User)
+def release_user_likes(sender, instance, **kwargs):
+    Post.objects.filter(likes=instance).update(likes_count=F('likes_count') - 1, updated_at=Now())
+
+
+@receiver(pre_save, sender=Comment)
+def move_comment(sender, instance, raw, **kwargs):
+    if raw or instance._state.adding:
+        return
+    old_post_id = Comment.objects.filter(pk=instance.pk).values_list('post_id', flat=True).first()
+    if old_post_id is None or old_post_id == instance.post_id:
+        return
+    Post.objects.filter(pk=old_post_id).update(comments_count=F('comments_count') - 1, updated_at=Now())
+    Post.objects.filter(pk=instance.post_id).update(comments_count=F('comments_count') + 1, updated_at=Now())
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(comments_count=F('comments_count') + 1, updated_at=Now())
+    else:
+        Post.objects.filter(pk=instance.post_id).update(updated_at=Now())
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_deleted_comment(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(comments_count=F('comments_count') - 1, updated_at=Now())
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=Post.likes.through)
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_sidebar(sender, action=None, **kwargs):
+    if action and not action.startswith('post_'):
+        return
+    transaction.on_commit(sidebar.bump_version)
+
+
+@receiver(post_migrate)
+def ensure_search_triggers(sender, using, **kwargs):
+    # any migration that rebuilds blog_post on SQLite drops the triggers
+    # of the search index, so they are checked after every migrate
+    if sender.name == 'blog':
+        restore_search_triggers(using)
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def apply_pragmas(db_connection, pragmas):
+    for name, value in pragmas.items():
+        db_connection.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    # the raw connection is used so the pragmas are not counted as page queries
+    apply_pragmas(connection.connection, settings.SQLITE_PRAGMAS)
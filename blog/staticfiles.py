@@ -0,0 +1,155 @@
+import gzip
+import mimetypes
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.eot', '.ttf', '.otf'}
+# a sibling is only kept when it saves at least this share of the file
+MIN_COMPRESSION_GAIN = 0.05
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MUTABLE_CACHE_CONTROL = 'public, max-age=60'
+ENCODINGS = {
+    'br': '.br',
+    'gzip': '.gz',
+}
+
+
+def compress_file(path):
+    with open(path, 'rb') as file:
+        content = file.read()
+
+    compressors = {'.gz': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressors['.br'] = lambda data: brotli.compress(data, quality=11)
+
+    written = []
+    for suffix, compress in compressors.items():
+        compressed = compress(content)
+        if len(compressed) > len(content) * (1 - MIN_COMPRESSION_GAIN):
+            continue
+        with open(path + suffix, 'wb') as file:
+            file.write(compressed)
+        written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def tolerant_converter(matchobj):
+            try:
+                return converter(matchobj)
+            except (ValueError, SuspiciousFileOperation):
+                # the theme css points at files it does not ship, some of them
+                # even outside of the static dir, those urls are left as they are
+                return matchobj.groupdict()['matched']
+        return tolerant_converter
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        # only hashed copies are compressed, they are the ones the pages link to
+        paths_to_compress = [
+            self.path(hashed_name)
+            for hashed_name in set(self.hashed_files.values())
+            if os.path.splitext(hashed_name)[1].lower() in COMPRESSIBLE_EXTENSIONS
+        ]
+        # brotli at the top quality is slow and holds the GIL, so files are compressed in processes
+        with ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn')) as executor:
+            for written in executor.map(compress_file, paths_to_compress, chunksize=16):
+                for path in written:
+                    yield os.path.relpath(path, self.location), None, True
+
+
+@dataclass
+class StaticFile:
+    path: str
+    content_type: str
+    encodings: dict
+    last_modified: float
+    immutable: bool
+
+
+def find_static_files(root, hashed_names):
+    static_files = {}
+    for directory, __, file_names in os.walk(root):
+        for file_name in file_names:
+            path = os.path.join(directory, file_name)
+            if file_name.endswith(tuple(ENCODINGS.values())):
+                continue
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            encodings = {
+                encoding: path + suffix
+                for encoding, suffix in ENCODINGS.items()
+                if os.path.exists(path + suffix)
+            }
+            static_files[name] = StaticFile(
+                path=path,
+                content_type=mimetypes.guess_type(file_name)[0] or 'application/octet-stream',
+                encodings=encodings,
+                last_modified=os.path.getmtime(path),
+                immutable=name in hashed_names,
+            )
+    return static_files
+
+
+def load_static_files():
+    storage = CompressedManifestStaticFilesStorage()
+    hashed_names = set(storage.hashed_files.values())
+    return find_static_files(settings.STATIC_ROOT, hashed_names)
+
+
+def parse_accept_encoding(header):
+    accepted = set()
+    for item in header.split(','):
+        encoding, *params = item.strip().split(';')
+        quality = 1.0
+        for param in params:
+            key, __, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        if quality > 0:
+            accepted.add(encoding.strip().lower())
+    return accepted
+
+
+def serve_static_file(request, static_file):
+    if not static_file.immutable:
+        modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        if modified_since is not None and int(static_file.last_modified) <= modified_since:
+            return HttpResponseNotModified()
+
+    accepted = parse_accept_encoding(request.headers.get('Accept-Encoding', ''))
+    encoding = next((encoding for encoding in static_file.encodings if encoding in accepted), None)
+    path = static_file.encodings[encoding] if encoding else static_file.path
+
+    response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+    # FileResponse takes the name of the opened file, which may be the .gz or .br copy
+    del response['Content-Disposition']
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if static_file.encodings:
+        response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if static_file.immutable else MUTABLE_CACHE_CONTROL
+    response['Last-Modified'] = http_date(static_file.last_modified)
+    return response
@@ -0,0 +1,771 @@
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from blog import likes, sidebar, views
+from blog.async_views import run_block
+from blog.models import Comment, Post, Tag
+from blog.query_budget import query_budget
+from blog.related import rebuild_related_posts
+from blog.search import restore_search_triggers, search_posts
+from blog.trending import refresh_trending
+from blog.views import fetch_fresh_posts
+
+
+# the manifest exists only after collectstatic
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(STORAGES=STORAGES)
+class HotViewsQueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.users = [User.objects.create_user(f'user{number}') for number in range(5)]
+        tags = [Tag.objects.create(title=f'tag{number}') for number in range(5)]
+        for number in range(12):
+            post = Post.objects.create(
+                title=f'Пост номер {number}',
+                text='Текст поста ' * 50,
+                slug=f'post-{number}',
+                image='',
+                published_at=now - timedelta(days=number),
+                author=cls.users[number % len(cls.users)],
+            )
+            post.tags.set(tags[:number % len(tags) + 1])
+            post.likes.set(cls.users[:number % len(cls.users)])
+            for comment_number in range(3):
+                Comment.objects.create(
+                    post=post,
+                    author=cls.users[comment_number],
+                    text=f'Комментарий {comment_number}',
+                    published_at=now,
+                )
+        rebuild_related_posts()
+        refresh_trending()
+        cls.post = Post.objects.get(slug='post-4')
+        cls.tag = tags[0]
+
+    def setUp(self):
+        # the cold cache is the worst case the budget has to cover
+        cache.clear()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    @query_budget('index')
+    def test_index(self):
+        self.get(reverse('index'))
+
+    @query_budget('index')
+    def test_index_page(self):
+        next_cursor = fetch_fresh_posts()['next_cursor']
+        self.get(f'{reverse("index", kwargs={"page": 2})}?after={next_cursor}')
+
+    @query_budget('post_detail')
+    def test_post_detail(self):
+        self.get(reverse('post_detail', kwargs={'slug': self.post.slug}))
+
+    @query_budget('post_detail')
+    def test_post_detail_logged_in(self):
+        self.client.force_login(self.users[0])
+        self.get(reverse('post_detail', kwargs={'slug': self.post.slug}))
+
+    @query_budget('post_comments')
+    def test_post_comments(self):
+        self.get(reverse('post_comments', kwargs={'slug': self.post.slug}))
+
+    @query_budget('tag_filter')
+    def test_tag_filter(self):
+        self.get(reverse('tag_filter', kwargs={'tag_title': self.tag.title}))
+
+    @query_budget('search')
+    def test_search(self):
+        response = self.get(f'{reverse("search")}?q=Пост')
+        self.assertContains(response, self.post.title)
+
+    @query_budget('contacts')
+    def test_contacts(self):
+        self.get(reverse('contacts'))
+
+
+@override_settings(STORAGES=STORAGES)
+class AdminChangelistQueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.superuser = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        tags = [Tag.objects.create(title=f'tag{number}') for number in range(3)]
+        for number in range(30):
+            post = Post.objects.create(
+                title=f'Пост номер {number}',
+                text='Текст поста',
+                slug=f'post-{number}',
+                image='',
+                published_at=now,
+                author=cls.superuser,
+            )
+            post.tags.set(tags)
+            Comment.objects.create(post=post, author=cls.superuser, text='Комментарий', published_at=now)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.superuser)
+
+    @query_budget('blog_post_changelist')
+    def test_post_changelist(self):
+        response = self.client.get(reverse('admin:blog_post_changelist'))
+        self.assertContains(response, 'Пост номер 29')
+        self.assertContains(response, 'tag0, tag1, tag2')
+
+    @query_budget('blog_comment_changelist')
+    def test_comment_changelist(self):
+        response = self.client.get(reverse('admin:blog_comment_changelist'))
+        self.assertContains(response, 'Комментарий')
+
+
+@override_settings(STORAGES=STORAGES, POSTS_PER_PAGE=5)
+class IndexPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.now = timezone.now()
+        cls.author = User.objects.create_user('author')
+        tag = Tag.objects.create(title='tag')
+        for number in range(12):
+            post = Post.objects.create(
+                title=f'Пост номер {number}',
+                text='Текст поста',
+                slug=f'post-{number}',
+                image='',
+                published_at=cls.now - timedelta(hours=number),
+                author=cls.author,
+            )
+            post.tags.add(tag)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_titles(self, response):
+        return [card.split('Пост номер ')[1].split('<')[0] for card in response.context['page_cards']]
+
+    def test_next_and_prev_cursors(self):
+        response = self.client.get(reverse('index'))
+        self.assertEqual(self.get_titles(response), ['0', '1', '2', '3', '4'])
+        self.assertIsNone(response.context['prev_cursor'])
+
+        response = self.client.get(
+            f'{reverse("index", kwargs={"page": 2})}?after={response.context["next_cursor"]}'
+        )
+        self.assertEqual(self.get_titles(response), ['5', '6', '7', '8', '9'])
+        self.assertEqual(response.context['prev_page'], 1)
+
+        response = self.client.get(
+            f'{reverse("index", kwargs={"page": 3})}?after={response.context["next_cursor"]}'
+        )
+        self.assertEqual(self.get_titles(response), ['10', '11'])
+        self.assertIsNone(response.context['next_cursor'])
+
+        response = self.client.get(
+            f'{reverse("index", kwargs={"page": 2})}?before={response.context["prev_cursor"]}'
+        )
+        self.assertEqual(self.get_titles(response), ['5', '6', '7', '8', '9'])
+        self.assertIsNotNone(response.context['next_cursor'])
+
+    def test_back_from_first_page_after_new_posts(self):
+        response = self.client.get(reverse('index'))
+        Post.objects.create(
+            title='Пост номер новый',
+            text='Текст поста',
+            slug='post-new',
+            image='',
+            published_at=self.now + timedelta(hours=1),
+            author=self.author,
+        )
+        next_cursor = response.context['next_cursor']
+        response = self.client.get(f'{reverse("index", kwargs={"page": 2})}?after={next_cursor}')
+        response = self.client.get(
+            f'{reverse("index", kwargs={"page": 1})}?before={response.context["prev_cursor"]}'
+        )
+        self.assertEqual(self.get_titles(response), ['0', '1', '2', '3', '4'])
+        self.assertEqual(response.context['prev_page'], 1)
+        self.assertContains(response, f'{reverse("index", kwargs={"page": 1})}?before=')
+
+    def test_page_zero_redirects_to_first_page(self):
+        next_cursor = self.client.get(reverse('index')).context['next_cursor']
+        response = self.client.get(f'{reverse("index", kwargs={"page": 0})}?after={next_cursor}')
+        self.assertRedirects(response, reverse('index'))
+
+
+# the async views run their queries in other threads, which do not see the
+# transaction a TestCase wraps every test in
+@override_settings(STORAGES=STORAGES, ROOT_URLCONF='sensive_blog.urls_async')
+class AsyncIndexPaginationTest(TransactionTestCase):
+    async def test_page_zero_redirects_to_first_page(self):
+        response = await self.async_client.get(f'{reverse("index", kwargs={"page": 0})}?after=1-1')
+        self.assertRedirects(response, reverse('index'), fetch_redirect_response=False)
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f'user{number}') for number in range(4)]
+        self.tags = [Tag.objects.create(title=f'tag{number}') for number in range(3)]
+        self.posts = [
+            Post.objects.create(
+                title=f'Пост номер {number}',
+                text='Текст поста',
+                slug=f'post-{number}',
+                image='',
+                published_at=timezone.now(),
+                author=self.users[0],
+            )
+            for number in range(3)
+        ]
+
+    def assertCounters(self, likes_counts=None, comments_counts=None, posts_counts=None):
+        # recount_counters --check fails when any counter differs from the data
+        call_command('recount_counters', check=True, stdout=StringIO())
+        if likes_counts is not None:
+            self.assertEqual([post.likes_count for post in self.fetch_posts()], likes_counts)
+        if comments_counts is not None:
+            self.assertEqual([post.comments_count for post in self.fetch_posts()], comments_counts)
+        if posts_counts is not None:
+            self.assertEqual([tag.posts_count for tag in Tag.objects.order_by('title')], posts_counts)
+
+    def fetch_posts(self):
+        return Post.objects.filter(pk__in=[post.pk for post in self.posts]).order_by('slug')
+
+    def add_comment(self, post, author):
+        return Comment.objects.create(post=post, author=author, text='Комментарий', published_at=timezone.now())
+
+    def test_likes_added_and_removed_from_post(self):
+        self.posts[0].likes.add(*self.users[:3])
+        self.assertCounters(likes_counts=[3, 0, 0])
+        # the last user never liked the post, removing them must not count
+        self.posts[0].likes.remove(self.users[0], self.users[3])
+        self.assertCounters(likes_counts=[2, 0, 0])
+        self.posts[0].likes.set([self.users[1], self.users[3]])
+        self.assertCounters(likes_counts=[2, 0, 0])
+        self.posts[0].likes.clear()
+        self.assertCounters(likes_counts=[0, 0, 0])
+
+    def test_likes_added_and_removed_from_user(self):
+        self.users[0].liked_posts.add(*self.posts)
+        self.users[1].liked_posts.add(self.posts[0])
+        self.assertCounters(likes_counts=[2, 1, 1])
+        self.users[0].liked_posts.remove(self.posts[1], self.posts[1].pk)
+        self.users[1].liked_posts.remove(self.posts[2])
+        self.assertCounters(likes_counts=[2, 0, 1])
+        self.users[0].liked_posts.clear()
+        self.assertCounters(likes_counts=[1, 0, 0])
+
+    def test_adding_a_like_twice_counts_once(self):
+        self.posts[0].likes.add(self.users[0])
+        self.posts[0].likes.add(self.users[0])
+        self.users[0].liked_posts.add(self.posts[0])
+        self.assertCounters(likes_counts=[1, 0, 0])
+
+    def test_tags_added_and_removed_from_both_sides(self):
+        self.posts[0].tags.add(*self.tags)
+        self.tags[0].posts.add(self.posts[1], self.posts[2])
+        self.assertCounters(posts_counts=[3, 1, 1])
+        self.posts[0].tags.remove(self.tags[1])
+        self.tags[0].posts.remove(self.posts[1], self.posts[1])
+        self.assertCounters(posts_counts=[2, 0, 1])
+        self.tags[0].posts.clear()
+        self.posts[0].tags.clear()
+        self.assertCounters(posts_counts=[0, 0, 0])
+
+    def test_deleted_user_releases_likes_and_comments(self):
+        self.posts[0].likes.add(self.users[1], self.users[2])
+        self.posts[1].likes.add(self.users[1])
+        self.add_comment(self.posts[0], self.users[1])
+        self.add_comment(self.posts[0], self.users[2])
+        self.users[1].delete()
+        self.assertCounters(likes_counts=[1, 0, 0], comments_counts=[1, 0, 0])
+
+    def test_deleted_post_releases_tags(self):
+        self.posts[0].tags.add(*self.tags)
+        self.posts[1].tags.add(self.tags[0])
+        self.add_comment(self.posts[0], self.users[1])
+        self.posts[0].delete()
+        self.posts.pop(0)
+        self.assertCounters(posts_counts=[1, 0, 0])
+
+    def test_comments_created_moved_and_deleted(self):
+        comment = self.add_comment(self.posts[0], self.users[1])
+        self.add_comment(self.posts[0], self.users[2])
+        self.assertCounters(comments_counts=[2, 0, 0])
+        comment.post = self.posts[1]
+        comment.save()
+        self.assertCounters(comments_counts=[1, 1, 0])
+        comment.text = 'Исправленный комментарий'
+        comment.save()
+        self.assertCounters(comments_counts=[1, 1, 0])
+        comment.delete()
+        self.assertCounters(comments_counts=[1, 0, 0])
+
+    def test_bulk_created_comments(self):
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.users[1], text='Комментарий', published_at=timezone.now())
+            for post in [self.posts[0], self.posts[0], self.posts[2]]
+        ])
+        self.assertCounters(comments_counts=[2, 0, 1])
+
+    def test_bulk_created_comments_with_conflicts(self):
+        comment = self.add_comment(self.posts[0], self.users[1])
+        copy = Comment(pk=comment.pk, post=self.posts[0], author=self.users[1], text='Копия', published_at=timezone.now())
+        new_comment = Comment(post=self.posts[1], author=self.users[1], text='Комментарий', published_at=timezone.now())
+        Comment.objects.bulk_create([copy, new_comment], ignore_conflicts=True)
+        self.assertCounters(comments_counts=[1, 1, 0])
+
+
+class SearchIndexTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author')
+
+    def create_post(self, title, text):
+        return Post.objects.create(
+            title=title,
+            text=text,
+            slug=f'post-{Post.objects.count()}',
+            image='',
+            published_at=timezone.now(),
+            author=self.author,
+        )
+
+    def find(self, query):
+        hits, __ = search_posts(query, 10)
+        return [hit.post_id for hit in hits]
+
+    def test_index_follows_created_edited_and_deleted_posts(self):
+        post = self.create_post('Рыбалка на озере', 'Как поймать щуку')
+        self.assertEqual(self.find('щуку'), [post.pk])
+
+        post.title = 'Поход в горы'
+        post.text = 'Как подняться на перевал'
+        post.save()
+        self.assertEqual(self.find('щуку'), [])
+        self.assertEqual(self.find('Рыбалка'), [])
+        self.assertEqual(self.find('перевал'), [post.pk])
+
+        post.delete()
+        self.assertEqual(self.find('перевал'), [])
+
+    def test_dropped_triggers_are_restored(self):
+        post = self.create_post('Рыбалка на озере', 'Как поймать щуку')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER blog_post_fts_insert')
+            cursor.execute('DROP TRIGGER blog_post_fts_update')
+        post.text = 'Как поймать окуня'
+        post.save()
+        unindexed_post = self.create_post('Поход в горы', 'Как подняться на перевал')
+        self.assertEqual(self.find('перевал'), [])
+
+        restored = restore_search_triggers(connection.alias)
+        self.assertEqual(sorted(restored), ['blog_post_fts_insert', 'blog_post_fts_update'])
+        self.assertEqual(self.find('перевал'), [unindexed_post.pk])
+        self.assertEqual(self.find('окуня'), [post.pk])
+        self.assertEqual(self.find('щуку'), [])
+        self.assertEqual(restore_search_triggers(connection.alias), [])
+
+
+@override_settings(POSTS_FEED_CHUNK_SIZE=3)
+class PostsFeedTest(TransactionTestCase):
+    def setUp(self):
+        author = User.objects.create_user('author')
+        tag = Tag.objects.create(title='tag')
+        for number in range(8):
+            post = Post.objects.create(
+                title=f'Пост номер {number}',
+                text='Текст поста',
+                slug=f'post-{number}',
+                image='',
+                published_at=timezone.now() - timedelta(hours=number),
+                author=author,
+            )
+            post.tags.add(tag)
+
+    def read_feed(self, response):
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    async def read_async_feed(self, response):
+        self.assertTrue(response.is_async)
+        return json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+
+    def get_feed(self, limit, after=None):
+        url = f'{reverse("posts_feed")}?limit={limit}' + (f'&after={after}' if after else '')
+        return self.read_feed(self.client.get(url))
+
+    def test_feed_pages(self):
+        feed = self.get_feed(limit=5)
+        self.assertEqual([post['slug'] for post in feed['posts']], [f'post-{number}' for number in range(5)])
+        feed = self.get_feed(limit=5, after=feed['next_cursor'])
+        self.assertEqual([post['slug'] for post in feed['posts']], ['post-5', 'post-6', 'post-7'])
+        self.assertIsNone(feed['next_cursor'])
+
+    def test_wrong_limit_and_cursor(self):
+        self.assertEqual(self.client.get(f'{reverse("posts_feed")}?limit=0').status_code, 400)
+        self.assertEqual(self.client.get(f'{reverse("posts_feed")}?after=nonsense').status_code, 404)
+
+    @override_settings(ROOT_URLCONF='sensive_blog.urls_async')
+    async def test_async_feed_matches_sync_feed(self):
+        # every limit around the chunk size, and the next page of each
+        for limit in [1, 2, 3, 4, 6, 8, 9]:
+            after = None
+            for __ in range(2):
+                url = f'{reverse("posts_feed")}?limit={limit}' + (f'&after={after}' if after else '')
+                sync_response = await sync_to_async(views.posts_feed)(RequestFactory().get(url))
+                sync_feed = await sync_to_async(self.read_feed)(sync_response)
+                self.assertEqual(await self.read_async_feed(await self.async_client.get(url)), sync_feed)
+                after = sync_feed['next_cursor']
+                if not after:
+                    break
+
+
+class RunBlockTest(TransactionTestCase):
+    async def test_block_checks_its_connections_before_and_after(self):
+        # the in-memory test database ignores close(), so the calls are recorded instead
+        calls = []
+
+        def count_posts():
+            calls.append(('block', threading.get_ident()))
+            return Post.objects.count()
+
+        def record_close():
+            calls.append(('close', threading.get_ident()))
+
+        with mock.patch('blog.async_views.close_old_connections', record_close):
+            self.assertEqual(await run_block(count_posts), 0)
+        block_thread = calls[1][1]
+        self.assertEqual(calls, [('close', block_thread), ('block', block_thread), ('close', block_thread)])
+        self.assertNotEqual(block_thread, threading.get_ident())
+
+
+@override_settings(LIKES_FLUSH_INTERVAL=60, LIKES_FLUSH_SIZE=100)
+class LikesBufferTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader')
+        self.post = Post.objects.create(
+            title='Пост',
+            text='Текст поста',
+            slug='post',
+            image='',
+            published_at=timezone.now(),
+            author=self.user,
+        )
+        self.addCleanup(self.drop_pending_likes)
+
+    def drop_pending_likes(self):
+        with likes.lock:
+            likes.pending_likes.clear()
+            if likes.flush_timer is not None:
+                likes.flush_timer.cancel()
+                likes.flush_timer = None
+
+    def assertLiked(self, liked):
+        self.assertEqual(self.post.likes.filter(pk=self.user.pk).exists(), liked)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, int(liked))
+
+    def test_last_click_in_window_wins(self):
+        likes.buffer_like(self.post.pk, self.user.pk, True)
+        likes.buffer_like(self.post.pk, self.user.pk, False)
+        likes.buffer_like(self.post.pk, self.user.pk, True)
+        self.assertIs(likes.get_pending_like(self.post.pk, self.user.pk), True)
+        self.assertIsNotNone(likes.flush_timer)
+
+        likes.flush_likes()
+        self.assertIsNone(likes.get_pending_like(self.post.pk, self.user.pk))
+        self.assertIsNone(likes.flush_timer)
+        self.assertLiked(True)
+
+    def test_unlike_twice(self):
+        self.post.likes.add(self.user)
+        likes.buffer_like(self.post.pk, self.user.pk, False)
+        likes.flush_likes()
+        likes.buffer_like(self.post.pk, self.user.pk, False)
+        likes.flush_likes()
+        self.assertLiked(False)
+
+    def test_flush_recounts_from_likes_table(self):
+        Post.objects.filter(pk=self.post.pk).update(likes_count=42)
+        likes.buffer_like(self.post.pk, self.user.pk, True)
+        likes.buffer_like(self.post.pk, self.user.pk, True)
+        likes.flush_likes()
+        self.assertLiked(True)
+
+    def test_full_buffer_is_flushed_at_once(self):
+        with override_settings(LIKES_FLUSH_SIZE=1):
+            likes.buffer_like(self.post.pk, self.user.pk, True)
+        self.assertIsNone(likes.flush_timer)
+        self.assertLiked(True)
+
+    @mock.patch('blog.likes.time.sleep')
+    def test_flush_retries_a_locked_database(self, sleep):
+        attempts = []
+
+        def fail_once(batch):
+            attempts.append(batch)
+            if len(attempts) == 1:
+                raise OperationalError('locked')
+            write_likes(batch)
+
+        write_likes = likes.write_likes
+        with mock.patch('blog.likes.write_likes', side_effect=fail_once):
+            likes.buffer_like(self.post.pk, self.user.pk, True)
+            likes.flush_likes()
+        self.assertEqual(len(attempts), 2)
+        self.assertLiked(True)
+
+    @mock.patch('blog.likes.time.sleep')
+    def test_failed_flush_requeues_and_reschedules(self, sleep):
+        def click_and_fail(batch):
+            # a newer click of the same reader comes while the db is locked
+            with likes.lock:
+                likes.pending_likes[(self.post.pk, self.user.pk)] = False
+            raise OperationalError('locked')
+
+        likes.buffer_like(self.post.pk, self.user.pk, True)
+        with mock.patch('blog.likes.write_likes', side_effect=click_and_fail):
+            with self.assertRaises(OperationalError):
+                likes.flush_likes()
+        self.assertIs(likes.get_pending_like(self.post.pk, self.user.pk), False)
+        self.assertIsNotNone(likes.flush_timer)
+
+        likes.buffer_like(self.post.pk, self.user.pk, True)
+        with mock.patch('blog.likes.write_likes', side_effect=OperationalError('locked')):
+            with self.assertRaises(OperationalError):
+                likes.flush_likes()
+        self.assertIs(likes.get_pending_like(self.post.pk, self.user.pk), True)
+        self.assertIsNotNone(likes.flush_timer)
+
+        likes.flush_likes()
+        self.assertIsNone(likes.get_pending_like(self.post.pk, self.user.pk))
+        self.assertLiked(True)
+
+
+class ImportJsonlTest(TestCase):
+    def setUp(self):
+        published_at = timezone.now().replace(microsecond=0)
+        users = [User.objects.create_user(f'user{number}', is_staff=True) for number in range(3)]
+        tags = [Tag.objects.create(title=f'tag{number}') for number in range(3)]
+        for number in range(4):
+            post = Post.objects.create(
+                title=f'Пост номер {number}',
+                text='Текст поста',
+                slug=f'post-{number}',
+                image='',
+                published_at=published_at - timedelta(days=number),
+                author=users[number % len(users)],
+            )
+            post.tags.set(tags[:number % len(tags) + 1])
+            post.likes.set(users[:number])
+            for user in users[:2]:
+                Comment.objects.create(post=post, author=user, text='Комментарий', published_at=published_at)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dump_path = os.path.join(directory.name, 'dump.jsonl')
+        call_command('export_jsonl', self.dump_path, stderr=StringIO())
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self):
+        return {
+            'posts': set(Post.objects.values_list('slug', 'title', 'author__username', 'published_at')),
+            'tags': set(Post.tags.through.objects.values_list('post__slug', 'tag__title')),
+            'comments': sorted(Comment.objects.values_list('post__slug', 'author__username', 'text', 'published_at')),
+            'likes': set(Post.likes.through.objects.values_list('post__slug', 'user__username')),
+        }
+
+    def import_dump(self, *args):
+        stdout = StringIO()
+        call_command('import_jsonl', self.dump_path, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def clear_db(self):
+        User.objects.all().delete()
+        Tag.objects.all().delete()
+
+    def test_round_trip(self):
+        self.clear_db()
+        output = self.import_dump()
+        self.assertIn('tag: 3, post: 4, comment: 8, like: 6', output)
+        self.assertEqual(self.take_snapshot(), self.snapshot)
+        call_command('recount_counters', check=True, stdout=StringIO())
+        self.assertFalse(os.path.exists(f'{self.dump_path}.progress'))
+
+    def test_import_again_creates_nothing(self):
+        self.clear_db()
+        self.import_dump()
+        self.assertIn('tag: 0, post: 0, comment: 0, like: 0', self.import_dump())
+        self.assertIn('tag: 0, post: 0, comment: 0, like: 0', self.import_dump('--restart'))
+        self.assertEqual(self.take_snapshot(), self.snapshot)
+
+    def test_resume_after_broken_line(self):
+        with open(self.dump_path, encoding='utf-8') as dump_file:
+            lines = dump_file.readlines()
+        broken_line_number = len(lines) - 3
+        with open(self.dump_path, 'w', encoding='utf-8') as dump_file:
+            dump_file.writelines(lines[:broken_line_number - 1] + ['{broken\n'] + lines[broken_line_number:])
+        self.clear_db()
+
+        with self.assertRaisesMessage(CommandError, f'Строка {broken_line_number}'):
+            self.import_dump('--batch-size', '4')
+        with open(f'{self.dump_path}.progress') as progress_file:
+            done_lines = int(progress_file.read())
+        self.assertEqual(done_lines, (broken_line_number - 1) // 4 * 4)
+
+        with open(self.dump_path, 'w', encoding='utf-8') as dump_file:
+            dump_file.writelines(lines)
+        output = self.import_dump('--batch-size', '4')
+        self.assertIn(f'Продолжаю после строки {done_lines}', output)
+        self.assertEqual(self.take_snapshot(), self.snapshot)
+        call_command('recount_counters', check=True, stdout=StringIO())
+        self.assertFalse(os.path.exists(f'{self.dump_path}.progress'))
+
+    def test_post_without_tags_is_rejected(self):
+        with open(self.dump_path, 'a', encoding='utf-8') as dump_file:
+            dump_file.write(json.dumps({
+                'type': 'post',
+                'slug': 'no-tags',
+                'title': 'Пост без тегов',
+                'text': 'Текст',
+                'published_at': '2024-01-01T00:00:00+00:00',
+                'author': 'user0',
+                'tags': [],
+            }) + '\n')
+        with self.assertRaisesMessage(CommandError, 'у поста нет тегов'):
+            self.import_dump()
+
+
+class SeedBlogTest(TestCase):
+    def seed(self, *args):
+        call_command(
+            'seed_blog', '--posts', '5', '--comments', '10', '--likes', '10', '--tags', '3', '--users', '3',
+            *args, stdout=StringIO(),
+        )
+
+    def test_clear_regenerates_dataset(self):
+        self.seed()
+        self.seed('--clear')
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(Tag.objects.count(), 3)
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Comment.objects.count(), 10)
+        call_command('recount_counters', check=True, stdout=StringIO())
+
+    def test_prefix_keeps_previous_dataset(self):
+        self.seed()
+        self.seed('--prefix', 'second')
+        self.assertEqual(Post.objects.filter(slug__startswith='second-post-').count(), 5)
+        self.assertEqual(Post.objects.count(), 10)
+
+    def test_clear_keeps_other_prefixes(self):
+        self.seed('--prefix', 'first')
+        self.seed('--prefix', 'second')
+        self.seed('--prefix', 'second', '--clear')
+        self.assertEqual(Post.objects.filter(slug__startswith='first-post-').count(), 5)
+        self.assertEqual(Post.objects.count(), 10)
+
+
+@override_settings(STORAGES=STORAGES)
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader')
+        self.tag = Tag.objects.create(title='tag')
+        self.post = Post.objects.create(
+            title='Пост',
+            text='Текст поста',
+            slug='post',
+            image='',
+            published_at=timezone.now(),
+            author=self.user,
+        )
+        self.post.tags.add(self.tag)
+        # the db clock counts milliseconds, a change right after the first
+        # response must not share its timestamp
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Post.objects.update(updated_at=an_hour_ago)
+        Tag.objects.update(updated_at=an_hour_ago)
+        self.urls = {
+            'index': reverse('index'),
+            'post': reverse('post_detail', kwargs={'slug': self.post.slug}),
+            'tag': reverse('tag_filter', kwargs={'tag_title': self.tag.title}),
+        }
+
+    def get_etags(self):
+        # the first response of the post page sets the csrf cookie its etag depends on
+        self.client.get(self.urls['post'])
+        return {name: self.client.get(url)['ETag'] for name, url in self.urls.items()}
+
+    def test_unchanged_pages_are_not_modified(self):
+        for name, etag in self.get_etags().items():
+            with self.subTest(name):
+                response = self.client.get(self.urls[name], HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                last_modified = self.client.get(self.urls[name])['Last-Modified']
+                response = self.client.get(self.urls[name], HTTP_IF_MODIFIED_SINCE=last_modified)
+                self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_post_costs_one_query(self):
+        etag = self.get_etags()['post']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.urls['post'], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def assertChanged(self, etags, names):
+        new_etags = self.get_etags()
+        for name in self.urls:
+            with self.subTest(name):
+                if name in names:
+                    self.assertNotEqual(new_etags[name], etags[name])
+                else:
+                    self.assertEqual(new_etags[name], etags[name])
+
+    def test_new_comment_changes_validators(self):
+        etags = self.get_etags()
+        Comment.objects.create(post=self.post, author=self.user, text='Комментарий', published_at=timezone.now())
+        self.assertChanged(etags, ['index', 'post', 'tag'])
+
+    def test_like_changes_validators(self):
+        etags = self.get_etags()
+        self.post.likes.add(self.user)
+        self.assertChanged(etags, ['index', 'post', 'tag'])
+
+    def test_tag_edit_changes_validators(self):
+        etags = self.get_etags()
+        other_tag = Tag.objects.create(title='other')
+        self.post.tags.add(other_tag)
+        self.assertChanged(etags, ['index', 'post', 'tag'])
+
+    def test_sidebar_version_changes_validators(self):
+        etags = self.get_etags()
+        sidebar.bump_version()
+        self.assertChanged(etags, ['index', 'post', 'tag'])
+
+    def test_logged_in_reader_always_gets_the_page(self):
+        etag = self.get_etags()['post']
+        self.client.force_login(self.user)
+        response = self.client.get(self.urls['post'], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,76 @@
+import contextlib
+import threading
+import time
+from contextvars import ContextVar
+
+from django.db import connections
+from django.template.base import Template
+
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.sql_queries = 0
+        self.sql_duration = 0
+        self.render_duration = 0
+        self.render_depth = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started_at
+            # async views run queries of one request in several threads
+            with self.lock:
+                self.sql_duration += duration
+                self.sql_queries += 1
+
+
+@contextlib.contextmanager
+def measure_queries(timings):
+    with contextlib.ExitStack() as stack:
+        if timings is not None:
+            for alias in connections:
+                connection = connections[alias]
+                if timings not in connection.execute_wrappers:
+                    stack.enter_context(connection.execute_wrapper(timings))
+        yield
+
+
+@contextlib.contextmanager
+def collect_timings():
+    timings = RequestTimings()
+    token = current_timings.set(timings)
+    try:
+        with measure_queries(timings):
+            yield timings
+    finally:
+        current_timings.reset(token)
+
+
+def install_render_timer():
+    if getattr(Template.render, 'is_timed', False):
+        return
+    original_render = Template.render
+
+    def render(self, context):
+        timings = current_timings.get()
+        if timings is None:
+            return original_render(self, context)
+
+        timings.render_depth += 1
+        started_at = time.perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            timings.render_depth -= 1
+            # included templates are already counted by the outermost one
+            if not timings.render_depth:
+                timings.render_duration += time.perf_counter() - started_at
+
+    render.is_timed = True
+    Template.render = render
@@ -0,0 +1,118 @@
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from blog.models import Post, TrendingPost
+
+
+# scores are counted from a fixed moment, so the ranking of posts nobody
+# touched stays right without recomputing them as time goes on
+EPOCH = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+# the likes flush and the comment signals set updated_at with the db clock
+REFRESH_OVERLAP = timedelta(minutes=1)
+TOP_POSTS = 5
+
+
+def get_exponent(moment):
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 60 * 60
+    return (moment - EPOCH).total_seconds() / half_life
+
+
+def add_activity(score, weight, moment):
+    # score is log2 of the activity, every like or comment counted with
+    # weight 2 ** (its time / half-life), the sum itself would overflow a float
+    if not weight:
+        return score
+    term = get_exponent(moment) + math.log2(weight)
+    top = max(score, term)
+    return top + math.log2(2 ** (score - top) + 2 ** (term - top))
+
+
+def remove_activity(score, weight, moment):
+    # a like is usually taken back soon after it was made, so it is removed
+    # with the weight of a fresh one
+    if not weight:
+        return score
+    term = get_exponent(moment) + math.log2(weight)
+    if term >= score:
+        return -math.inf
+    return score + math.log2(1 - 2 ** (term - score))
+
+
+def get_activity_weight(likes_count, comments_count):
+    return likes_count * settings.TRENDING_LIKE_WEIGHT + comments_count * settings.TRENDING_COMMENT_WEIGHT
+
+
+def make_trending_post(post, now):
+    # a new post counts as one like at its publication, its likes and comments
+    # made before the first refresh are counted at the publication too
+    activity = 1 + get_activity_weight(post['likes_count'], post['comments_count'])
+    return TrendingPost(
+        post_id=post['id'],
+        score=get_exponent(post['published_at']) + math.log2(activity),
+        likes_count=post['likes_count'],
+        comments_count=post['comments_count'],
+        refreshed_at=now,
+    )
+
+
+def update_trending_post(trending_post, post, now):
+    likes_delta = post['likes_count'] - trending_post.likes_count
+    comments_delta = post['comments_count'] - trending_post.comments_count
+    removed_weight = get_activity_weight(max(-likes_delta, 0), max(-comments_delta, 0))
+    added_weight = get_activity_weight(max(likes_delta, 0), max(comments_delta, 0))
+
+    score = remove_activity(trending_post.score, removed_weight, now)
+    # the likes and comments left can not weigh less than if they all were
+    # made at the publication
+    kept_weight = get_activity_weight(
+        min(trending_post.likes_count, post['likes_count']),
+        min(trending_post.comments_count, post['comments_count']),
+    )
+    score = max(score, get_exponent(post['published_at']) + math.log2(1 + kept_weight))
+    trending_post.score = add_activity(score, added_weight, now)
+    trending_post.likes_count = post['likes_count']
+    trending_post.comments_count = post['comments_count']
+    trending_post.refreshed_at = now
+
+
+def get_top_post_ids():
+    return list(TrendingPost.objects.order_by('-score').values_list('post_id', flat=True)[:TOP_POSTS])
+
+
+def refresh_trending(full=False, batch_size=1000):
+    now = timezone.now()
+    last_refreshed_at = TrendingPost.objects.aggregate(last=Max('refreshed_at'))['last']
+    top_post_ids = get_top_post_ids()
+
+    with transaction.atomic():
+        posts = Post.objects.order_by().values('id', 'published_at', 'likes_count', 'comments_count')
+        if full:
+            TrendingPost.objects.all().delete()
+        elif last_refreshed_at:
+            # a post seen twice gets the same counters, so overlapping runs are harmless
+            posts = posts.filter(updated_at__gte=last_refreshed_at - REFRESH_OVERLAP)
+
+        refreshed = 0
+        posts = list(posts)
+        for start in range(0, len(posts), batch_size):
+            batch = {post['id']: post for post in posts[start:start + batch_size]}
+            trending_posts = TrendingPost.objects.in_bulk(batch.keys())
+            new_trending_posts = []
+            for post_id, post in batch.items():
+                if post_id in trending_posts:
+                    update_trending_post(trending_posts[post_id], post, now)
+                else:
+                    new_trending_posts.append(make_trending_post(post, now))
+            TrendingPost.objects.bulk_update(
+                trending_posts.values(),
+                ['score', 'likes_count', 'comments_count', 'refreshed_at'],
+            )
+            TrendingPost.objects.bulk_create(new_trending_posts)
+            refreshed += len(batch)
+
+    return refreshed, get_top_post_ids() != top_post_ids
@@ -1,118 +1,358 @@
-from django.db.models import Count
-from django.shortcuts import render, get_object_or_404
-from blog.models import Post, Tag
+import functools
+import hashlib
+import inspect
+import json
 
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render, get_object_or_404
+from django.views.decorators.http import condition, require_POST
+from blog.cards import CARD_KEY_FIELDS, get_cards, render_card
+from blog.feeds import LatestPostsFeed
+from blog.models import Comment, Post, Tag
+from blog.pagination import decode_cursor, encode_cursor, order_by_keyset, paginate_by_keyset
+from blog.related import get_related_posts
+from blog.search import search_posts
+from blog.images import serialize_image
+from blog.likes import buffer_like, get_pending_like
+from blog.serializers import serialize_comment, serialize_comment_for_json, serialize_post_for_json, serialize_tag
+from blog import sidebar
+from blog.sidebar import get_popular_posts, get_popular_tags
 
-def serialize_post(post):
-    return {
-        'title': post.title,
-        'teaser_text': post.text[:200],
-        'author': post.author.username,
-        'comments_amount': post.total_comments,
-        'image_url': post.image.url if post.image else None,
-        'published_at': post.published_at,
-        'slug': post.slug,
-        'tags': [serialize_tag(tag) for tag in post.tags.all()],
-        'first_tag_title': post.tags.all()[0].title,
-    }
 
+def once_per_request(get_last_modified):
+    # condition() asks for the etag and the last modified time separately, and
+    # the etag is made from the same timestamp, so it is read from the db once; url
+    # arguments come as keywords from condition() and positionally from the etag
+    signature = inspect.signature(get_last_modified)
 
-def serialize_tag(tag):
-    return {
-        'title': tag.title,
-        'posts_with_tag': tag.posts__count,
-    }
+    @functools.wraps(get_last_modified)
+    def wrapper(request, *args, **kwargs):
+        arguments = signature.bind(request, *args, **kwargs)
+        arguments.apply_defaults()
+        key = (get_last_modified.__name__, *list(arguments.arguments.items())[1:])
+        timestamps = request.__dict__.setdefault('_last_modified', {})
+        if key not in timestamps:
+            timestamps[key] = get_last_modified(request, *args, **kwargs)
+        return timestamps[key]
+    return wrapper
+
+
+def make_etag(last_modified):
+    if last_modified is None:
+        return None
+    return f'{last_modified.timestamp()}-{sidebar.get_version()}'
+
+
+@once_per_request
+def index_last_modified(request, page=1):
+    return Post.objects.aggregate(last_modified=Max('updated_at'))['last_modified']
+
+
+def index_etag(request, page=1):
+    return make_etag(index_last_modified(request, page))
+
+
+@once_per_request
+def post_last_modified(request, slug):
+    # the page of a logged in user shows whether they liked the post, and a
+    # like may still wait in the buffer, so such pages are never answered with 304
+    if request.user.is_authenticated:
+        return None
+    return Post.objects.filter(slug=slug).values_list('updated_at', flat=True).first()
+
+
+def post_etag(request, slug):
+    etag = make_etag(post_last_modified(request, slug))
+    if etag is None:
+        return None
+    # the page carries a csrf token made from the cookie secret of this browser
+    csrf_secret = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return f'{etag}-{hashlib.md5(csrf_secret.encode()).hexdigest()[:8]}'
+
+
+@once_per_request
+def tag_last_modified(request, tag_title):
+    tag = Tag.objects.filter(title=tag_title).aggregate(
+        tag_updated_at=Max('updated_at'),
+        posts_updated_at=Max('posts__updated_at'),
+    )
+    timestamps = [timestamp for timestamp in tag.values() if timestamp]
+    return max(timestamps, default=None)
 
 
-def index(request):
-    popular_posts = Post.objects.popular(). \
-        select_related('author') \
-        .fetch_posts_count_for_tags() \
-        .fetch_with_total_comments()[:5]
+def tag_etag(request, tag_title):
+    return make_etag(tag_last_modified(request, tag_title))
 
-    fresh_posts = list(
-        Post.objects \
-        .annotate(total_comments=Count('comments', distinct=True)) \
-        .order_by('published_at').select_related('author') \
-        .fetch_posts_count_for_tags()
-    )[-5:]
 
-    popular_tags = Tag.objects.popular()[:5]
+def fetch_fresh_posts(after=None, before=None):
+    try:
+        fresh_posts = paginate_by_keyset(
+            Post.objects.values(*CARD_KEY_FIELDS, 'published_at'),
+            settings.POSTS_PER_PAGE,
+            after=after,
+            before=before,
+        )
+    except ValueError:
+        raise Http404('Неверный курсор страницы')
+
+    return {
+        'page_cards': get_cards('wide', fresh_posts.items),
+        'prev_cursor': fresh_posts.prev_cursor,
+        'next_cursor': fresh_posts.next_cursor,
+    }
+
+
+@condition(etag_func=index_etag, last_modified_func=index_last_modified)
+def index(request, page=1):
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    # the number is only a label, the cursor picks the posts, and going back
+    # from the first page after new posts came out must not end on page 0
+    if page < 1 or page > 1 and not (after or before):
+        return redirect('index')
 
     context = {
-        'most_popular_posts': [serialize_post(post) for post in popular_posts],
-        'page_posts': [serialize_post(post) for post in fresh_posts],
-        'popular_tags': [serialize_tag(tag) for tag in popular_tags],
+        'most_popular_posts': get_popular_posts(),
+        'popular_tags': get_popular_tags(),
+        'page': page,
+        'prev_page': max(page - 1, 1),
+        'next_page': page + 1,
+        **fetch_fresh_posts(after, before),
     }
-    print(context)
     return render(request, 'index.html', context)
 
 
-def post_detail(request, slug):
+def fetch_comments_page(post_id, after=None):
+    comments = Comment.objects.filter(post_id=post_id) \
+        .values('id', 'text', 'published_at', 'author__username')
+    return paginate_by_keyset(
+        comments,
+        settings.COMMENTS_PER_PAGE,
+        after=after,
+        descending=False,
+    )
+
+
+def fetch_post(slug, user):
     post = get_object_or_404(
-        Post.objects.select_related('author').annotate(total_likes=Count('likes')),
+        Post.objects.select_related('author'),
         slug=slug,
     )
 
-    comments = post.comments.select_related('author').all()
-    serialized_comments = []
-    for comment in comments:
-        serialized_comments.append({
-            'text': comment.text,
-            'published_at': comment.published_at,
-            'author': post.author,
-        })
+    comments = fetch_comments_page(post.id)
 
-    related_tags = post.tags.annotate(posts__count=Count('posts'))
+    related_tags = post.tags.all()
 
     serialized_post = {
         'title': post.title,
         'text': post.text,
         'author': post.author.username,
-        'comments': serialized_comments,
-        'likes_amount': post.total_likes,
+        'comments': [serialize_comment(comment) for comment in comments.items],
+        'comments_amount': post.comments_count,
+        'comments_next_cursor': comments.next_cursor,
+        'likes_amount': post.likes_count,
         'image_url': post.image.url if post.image else None,
+        'image': serialize_image(post),
         'published_at': post.published_at,
         'slug': post.slug,
         'tags': [serialize_tag(tag) for tag in related_tags],
     }
+    return {
+        'post': serialized_post,
+        'related_posts': get_related_posts(post.id),
+        'liked': is_liked(post.id, user),
+    }
 
-    popular_tags = Tag.objects.popular()[:5]
-
-    popular_posts = Post.objects.popular(). \
-        select_related('author'). \
-        fetch_posts_count_for_tags(). \
-        fetch_with_total_comments()[:5]
 
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
+def post_detail(request, slug):
     context = {
-        'post': serialized_post,
-        'popular_tags': [serialize_tag(tag) for tag in popular_tags],
-        'popular_posts': [serialize_post(post) for post in popular_posts],
+        **fetch_post(slug, request.user),
+        'popular_tags': get_popular_tags(),
+        'most_popular_posts': get_popular_posts(),
     }
     return render(request, 'post-details.html', context)
 
 
+def is_liked(post_id, user):
+    if not user.is_authenticated:
+        return False
+    pending_like = get_pending_like(post_id, user.id)
+    if pending_like is not None:
+        return pending_like
+    return Post.likes.through.objects.filter(post_id=post_id, user_id=user.id).exists()
+
+
+@require_POST
+def post_like(request, slug):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Войдите, чтобы ставить лайки'}, status=401)
+
+    post = Post.objects.filter(slug=slug).values('id', 'likes_count').first()
+    if post is None:
+        raise Http404('Пост не найден')
+
+    liked = request.POST.get('action', 'like') != 'unlike'
+    liked_in_db = Post.likes.through.objects.filter(post_id=post['id'], user_id=request.user.id).exists()
+    buffer_like(post['id'], request.user.id, liked)
+
+    return JsonResponse({
+        'liked': liked,
+        'likes_amount': post['likes_count'] + int(liked) - int(liked_in_db),
+    })
+
+
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
+def post_comments(request, slug):
+    post_id = Post.objects.filter(slug=slug).values_list('id', flat=True).first()
+    if post_id is None:
+        raise Http404('Пост не найден')
+
+    try:
+        comments = fetch_comments_page(post_id, after=request.GET.get('after'))
+    except ValueError:
+        raise Http404('Неверный курсор страницы')
+
+    return JsonResponse({
+        'comments': [serialize_comment_for_json(comment) for comment in comments.items],
+        'next_cursor': comments.next_cursor,
+    })
+
+
+def fetch_tag_posts(tag_title):
+    tag = get_object_or_404(Tag.objects.only('title'), title=tag_title)
+
+    related_posts = tag.posts.values(*CARD_KEY_FIELDS)[:20]
+
+    return {
+        'tag': tag.title,
+        'cards': get_cards('small', related_posts),
+    }
+
+
+@condition(etag_func=tag_etag, last_modified_func=tag_last_modified)
 def tag_filter(request, tag_title):
-    tag = get_object_or_404(Tag, title=tag_title)
+    context = {
+        **fetch_tag_posts(tag_title),
+        'popular_tags': get_popular_tags(),
+        'most_popular_posts': get_popular_posts(),
+    }
+    return render(request, 'posts-list.html', context)
 
-    popular_posts = Post.objects.popular() \
-        .select_related('author') \
-        .fetch_posts_count_for_tags() \
-        .fetch_with_total_comments()[:5]
 
-    related_posts = tag.posts.fetch_posts_count_for_tags().select_related('author').all()[:20]
-    related_posts = related_posts.annotate(total_comments=Count('comments'))
+def search(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        hits, next_cursor = search_posts(
+            query,
+            settings.POSTS_PER_PAGE,
+            after=request.GET.get('after'),
+        )
+    except ValueError:
+        raise Http404('Неверный курсор страницы')
 
-    popular_tags = Tag.objects.popular()[:5]
+    posts = Post.objects.for_cards().in_bulk([hit.post_id for hit in hits])
+    # snippets depend on the query, so these cards are not cached, and a hit
+    # of a post deleted since the search is left out
+    found_cards = [
+        render_card('small', posts[hit.post_id], snippet=hit.snippet)
+        for hit in hits
+        if hit.post_id in posts
+    ]
 
     context = {
-        'tag': tag.title,
-        'popular_tags': [serialize_tag(tag) for tag in popular_tags],
-        "posts": [serialize_post(post) for post in related_posts],
-        'popular_posts': [serialize_post(post) for post in popular_posts],
+        'query': query,
+        'cards': found_cards,
+        'next_cursor': next_cursor,
+        'popular_tags': get_popular_tags(),
+        'most_popular_posts': get_popular_posts(),
     }
     return render(request, 'posts-list.html', context)
 
 
+FEED_START = '{"posts": ['
+
+
+def serialize_feed_post(post, number):
+    serialized_post = json.dumps(serialize_post_for_json(post), cls=DjangoJSONEncoder, ensure_ascii=False)
+    return f',{serialized_post}' if number else serialized_post
+
+
+def serialize_feed_end(next_cursor):
+    return f'], "next_cursor": {json.dumps(next_cursor)}}}'
+
+
+def stream_posts(posts, limit):
+    yield FEED_START
+    last_post, next_cursor = None, None
+    # the iterator reads the posts from the db in chunks, so only one chunk is in memory
+    for number, post in enumerate(posts.iterator(chunk_size=settings.POSTS_FEED_CHUNK_SIZE)):
+        if number == limit:
+            next_cursor = encode_cursor(last_post)
+            break
+        yield serialize_feed_post(post, number)
+        last_post = post
+    yield serialize_feed_end(next_cursor)
+
+
+def fetch_feed_chunk(after, size):
+    return list(order_by_keyset(Post.objects.for_cards(), after)[:size])
+
+
+def get_feed_limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.POSTS_FEED_LIMIT))
+    except ValueError:
+        return None
+    return limit if 0 < limit <= settings.POSTS_FEED_MAX_LIMIT else None
+
+
+def make_feed_limit_error():
+    return JsonResponse(
+        {'error': f'limit должен быть от 1 до {settings.POSTS_FEED_MAX_LIMIT}'},
+        status=400,
+    )
+
+
+def get_feed_cursor(request):
+    after = request.GET.get('after')
+    if after:
+        try:
+            decode_cursor(after)
+        except ValueError:
+            raise Http404('Неверный курсор страницы')
+    return after
+
+
+def posts_feed(request):
+    limit = get_feed_limit(request)
+    if limit is None:
+        return make_feed_limit_error()
+
+    posts = order_by_keyset(Post.objects.for_cards(), get_feed_cursor(request))
+    return StreamingHttpResponse(
+        stream_posts(posts[:limit + 1], limit),
+        content_type='application/json',
+    )
+
+
+def render_atom_feed(request):
+    response = LatestPostsFeed()(request)
+    return {'content': response.content, 'content_type': response['Content-Type']}
+
+
+@condition(etag_func=index_etag, last_modified_func=index_last_modified)
+def atom_feed(request):
+    # the feed is rendered once per version of the posts, like the sidebar
+    feed = sidebar.get_cached_block(
+        f'atom_feed:{request.get_host()}',
+        lambda: render_atom_feed(request),
+    )
+    return HttpResponse(feed['content'], content_type=feed['content_type'])
+
+
 def contacts(request):
     return render(request, 'contacts.html')
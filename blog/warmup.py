@@ -0,0 +1,64 @@
+import os
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+from blog.cards import CARD_KEY_FIELDS, get_cards
+from blog.models import Tag
+from blog.sidebar import get_popular_posts, get_popular_tags
+from blog.views import fetch_fresh_posts
+
+
+HOT_TAGS = 5
+
+
+def compile_templates():
+    # the cached loader keeps every compiled template for the life of the process
+    template_names = []
+    for directory, __, file_names in os.walk(settings.TEMPLATE_DIR):
+        for file_name in file_names:
+            template_name = os.path.relpath(os.path.join(directory, file_name), settings.TEMPLATE_DIR)
+            get_template(template_name)
+            template_names.append(template_name)
+    return len(template_names)
+
+
+def load_urls():
+    resolver = get_resolver()
+    # the url patterns are compiled and the views imported on the first resolve
+    resolver.resolve('/')
+    return len(resolver.reverse_dict)
+
+
+def fill_caches():
+    # the sidebar with the trending posts, the first page of the index
+    # and the pages of the most used tags
+    get_popular_posts()
+    get_popular_tags()
+    cards_count = len(fetch_fresh_posts()['page_cards'])
+    for tag in Tag.objects.popular().only('id')[:HOT_TAGS]:
+        cards_count += len(get_cards('small', tag.posts.values(*CARD_KEY_FIELDS)[:20]))
+    return cards_count
+
+
+WARMUP_STEPS = [
+    ('templates', compile_templates),
+    ('urls', load_urls),
+    ('caches', fill_caches),
+]
+
+
+def warmup():
+    timings = []
+    try:
+        for name, step in WARMUP_STEPS:
+            started_at = time.perf_counter()
+            count = step()
+            timings.append((name, count, time.perf_counter() - started_at))
+    finally:
+        # a connection opened before the workers fork must not be shared by them
+        connections.close_all()
+    return timings
@@ -0,0 +1,19 @@
+"""
+ASGI config for blog project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Pages are served by the async views from ``blog.async_views``, which fetch
+independent page blocks concurrently.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sensive_blog.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+
+application = get_asgi_application()
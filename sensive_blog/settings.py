@@ -9,9 +9,12 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', [])
 
-SECRET_KEY = env.str('SECRET_KEY', 'REPLACE_ME')
+# the production profile drops the debug tools and fills the caches at start
+PRODUCTION = env.bool('PRODUCTION', False)
 
-DEBUG = env.bool('DEBUG', True)
+SECRET_KEY = env.str('SECRET_KEY') if PRODUCTION else env.str('SECRET_KEY', 'REPLACE_ME')
+
+DEBUG = env.bool('DEBUG', not PRODUCTION)
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -20,39 +23,65 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'debug_toolbar',
     'blog',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'blog.middleware.StaticFilesMiddleware',
+    'blog.middleware.ServerTimingMiddleware',
+    'blog.middleware.ReplicaMiddleware',
+    'blog.middleware.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if not PRODUCTION:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
+WARMUP_ON_START = env.bool('WARMUP_ON_START', PRODUCTION)
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
-ROOT_URLCONF = 'sensive_blog.urls'
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', False)
+
+ROOT_URLCONF = 'sensive_blog.urls_async' if ASYNC_VIEWS else 'sensive_blog.urls'
 
 TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
-STATIC_ROOT = ''
+STATIC_ROOT = env.str('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+# without a web server in front, collected static files are served by blog.middleware
+SERVE_STATIC = env.bool('SERVE_STATIC', not DEBUG)
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'blog.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
 
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATE_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -64,6 +93,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'sensive_blog.wsgi.application'
+ASGI_APPLICATION = 'sensive_blog.asgi.application'
 
 DATABASES = {
     'default': {
@@ -73,6 +103,37 @@ DATABASES = {
     }
 }
 
+SQLITE_TUNED = env.bool('SQLITE_TUNED', False)
+
+if SQLITE_TUNED:
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': env.int('DATABASE_CONN_MAX_AGE', 600),
+        'CONN_HEALTH_CHECKS': True,
+    })
+
+SQLITE_TUNED_PRAGMAS = {
+    'journal_mode': env.str('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': env.str('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'mmap_size': env.int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+    'cache_size': env.int('SQLITE_CACHE_SIZE', -64 * 1024),
+    'busy_timeout': env.int('SQLITE_BUSY_TIMEOUT', 5000),
+    'temp_store': 'MEMORY',
+}
+# applied to every new SQLite connection by blog.sqlite
+SQLITE_PRAGMAS = SQLITE_TUNED_PRAGMAS if SQLITE_TUNED else {}
+
+DATABASE_REPLICAS = []
+for number, replica_filepath in enumerate(env.list('DATABASE_REPLICA_FILEPATHS', []), start=1):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'NAME': replica_filepath,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['blog.routers.ReplicaRouter'] if DATABASE_REPLICAS else []
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', 5)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',  # noqa: E501
@@ -102,4 +163,72 @@ STATIC_URL = '/static/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+
+IMAGE_VARIANT_WIDTHS = env.list('IMAGE_VARIANT_WIDTHS', [320, 640, 1280], subcast=int)
+IMAGE_VARIANT_QUALITY = env.int('IMAGE_VARIANT_QUALITY', 80)
+IMAGE_VARIANT_WORKERS = env.int('IMAGE_VARIANT_WORKERS', 2)
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# locmem is private to each process, several workers need a shared backend
+CACHES = {
+    'default': {
+        'BACKEND': env.str('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env.str('CACHE_LOCATION', ''),
+    }
+}
+
+SIDEBAR_CACHE_TIMEOUT = env.int('SIDEBAR_CACHE_TIMEOUT', 60 * 60)
+SIDEBAR_CACHE_LOCK_TIMEOUT = env.int('SIDEBAR_CACHE_LOCK_TIMEOUT', 5)
+POST_CARD_CACHE_TIMEOUT = env.int('POST_CARD_CACHE_TIMEOUT', 24 * 60 * 60)
+
+POSTS_PER_PAGE = env.int('POSTS_PER_PAGE', 5)
+COMMENTS_PER_PAGE = env.int('COMMENTS_PER_PAGE', 20)
+
+TRENDING_HALF_LIFE_HOURS = env.float('TRENDING_HALF_LIFE_HOURS', 24)
+TRENDING_LIKE_WEIGHT = env.float('TRENDING_LIKE_WEIGHT', 1)
+TRENDING_COMMENT_WEIGHT = env.float('TRENDING_COMMENT_WEIGHT', 2)
+
+RELATED_POSTS_COUNT = env.int('RELATED_POSTS_COUNT', 5)
+RELATED_POSTS_MAX_TAG_POSTS = env.int('RELATED_POSTS_MAX_TAG_POSTS', 5000)
+
+ADMIN_EXACT_COUNT_LIMIT = env.int('ADMIN_EXACT_COUNT_LIMIT', 10000)
+ADMIN_COUNT_CACHE_TIMEOUT = env.int('ADMIN_COUNT_CACHE_TIMEOUT', 60)
+
+POSTS_FEED_LIMIT = env.int('POSTS_FEED_LIMIT', 100)
+POSTS_FEED_MAX_LIMIT = env.int('POSTS_FEED_MAX_LIMIT', 10000)
+POSTS_FEED_CHUNK_SIZE = env.int('POSTS_FEED_CHUNK_SIZE', 500)
+ATOM_FEED_POSTS = env.int('ATOM_FEED_POSTS', 20)
+
+LIKES_FLUSH_INTERVAL = env.float('LIKES_FLUSH_INTERVAL', 1.0)
+LIKES_FLUSH_SIZE = env.int('LIKES_FLUSH_SIZE', 500)
+
+PROFILE_DIR = env.str('PROFILE_DIR', '')
+PROFILE_SAMPLE_RATE = env.float('PROFILE_SAMPLE_RATE', 0)
+PROFILE_SAMPLE_INTERVAL = env.float('PROFILE_SAMPLE_INTERVAL', 5)
+PROFILE_TOKEN_MAX_AGE = env.int('PROFILE_TOKEN_MAX_AGE', 60 * 60)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'timing': {
+            'format': (
+                '%(asctime)s %(message)s url_name=%(url_name)s sql_queries=%(sql_queries)s '
+                'sql_ms=%(sql_ms)s render_ms=%(render_ms)s view_ms=%(view_ms)s'
+            ),
+        },
+    },
+    'handlers': {
+        'timing': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'timing',
+        },
+    },
+    'loggers': {
+        'blog.timing': {
+            'handlers': ['timing'],
+            'level': env.str('TIMING_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
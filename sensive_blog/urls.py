@@ -5,13 +5,25 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
-urlpatterns = [
-    path('admin/', admin.site.urls),
-    path('page/<int:page>', views.index, name='index'),
-    path('post/<slug:slug>', views.post_detail, name='post_detail'),
-    path('tag/<slug:tag_title>', views.tag_filter, name='tag_filter'),
-    path('contacts/', views.contacts, name='contacts'),
-    path('', views.index, name='index'),
-    path("__debug__/", include("debug_toolbar.urls")),
-]
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+def build_urlpatterns(index, post_detail, tag_filter, posts_feed):
+    urlpatterns = [
+        path('admin/', admin.site.urls),
+        path('page/<int:page>', index, name='index'),
+        path('post/<slug:slug>', post_detail, name='post_detail'),
+        path('post/<slug:slug>/comments', views.post_comments, name='post_comments'),
+        path('post/<slug:slug>/like', views.post_like, name='post_like'),
+        path('tag/<slug:tag_title>', tag_filter, name='tag_filter'),
+        path('search/', views.search, name='search'),
+        path('feed/posts.json', posts_feed, name='posts_feed'),
+        path('feed/atom.xml', views.atom_feed, name='atom_feed'),
+        path('contacts/', views.contacts, name='contacts'),
+        path('', index, name='index'),
+    ]
+    if 'debug_toolbar' in settings.INSTALLED_APPS:
+        urlpatterns.append(path("__debug__/", include("debug_toolbar.urls")))
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    return urlpatterns
+
+
+urlpatterns = build_urlpatterns(views.index, views.post_detail, views.tag_filter, views.posts_feed)
@@ -0,0 +1,10 @@
+from blog import async_views
+from sensive_blog.urls import build_urlpatterns
+
+
+urlpatterns = build_urlpatterns(
+    async_views.index,
+    async_views.post_detail,
+    async_views.tag_filter,
+    async_views.posts_feed,
+)
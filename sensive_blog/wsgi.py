@@ -2,6 +2,8 @@
 WSGI config for blog project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+With ``WARMUP_ON_START`` the templates, urls and hot caches are warmed up
+when the module is imported.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/1.11/howto/deployment/wsgi/
@@ -9,8 +11,15 @@ https://docs.djangoproject.com/en/1.11/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sensive_blog.settings')
 
 application = get_wsgi_application()
+
+# with gunicorn --preload this runs once in the master, and the forked
+# workers start with compiled templates and filled caches
+if settings.WARMUP_ON_START:
+    from blog.warmup import warmup
+    warmup()